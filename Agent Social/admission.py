@@ -0,0 +1,217 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from llm_gateway import LLM_CONCURRENCY
+from render_workers import RENDER_WORKERS
+from runtime import background_loop
+
+# Renderizações simultâneas por engine (padrão: páginas do pool x processos de renderização)
+ADMIT_PLAYWRIGHT_CONCURRENCY = int(os.getenv(
+    'ADMIT_PLAYWRIGHT_CONCURRENCY', int(os.getenv('RENDER_POOL_SIZE', 2)) * max(RENDER_WORKERS, 1)
+))
+ADMIT_SELENIUM_CONCURRENCY = int(os.getenv(
+    'ADMIT_SELENIUM_CONCURRENCY', int(os.getenv('SELENIUM_POOL_SIZE', 2)) * max(RENDER_WORKERS, 1)
+))
+# Formatos caros têm limite próprio para não ocuparem todas as vagas do engine
+ADMIT_GIF_CONCURRENCY = int(os.getenv('ADMIT_GIF_CONCURRENCY', 2))
+ADMIT_MP4_CONCURRENCY = int(os.getenv('ADMIT_MP4_CONCURRENCY', 1))
+# Previews renderizados simultâneos (limita quantas vagas dos engines eles podem ocupar)
+ADMIT_PREVIEW_CONCURRENCY = int(os.getenv('ADMIT_PREVIEW_CONCURRENCY', 1))
+# Chamadas ao LLM admitidas (o gateway ainda limita as conexões upstream)
+ADMIT_LLM_CONCURRENCY = int(os.getenv('ADMIT_LLM_CONCURRENCY', LLM_CONCURRENCY))
+# Requests aguardando vaga por fila; acima disso a resposta é 429 imediato
+ADMIT_QUEUE_SIZE = int(os.getenv('ADMIT_QUEUE_SIZE', 32))
+# Espera máxima por uma vaga antes de responder 503
+ADMIT_QUEUE_TIMEOUT = float(os.getenv('ADMIT_QUEUE_TIMEOUT', 10))
+
+# Classes de prioridade: menor número é atendido primeiro quando uma vaga abre
+PRIORITY_INTERACTIVE = 0  # PNG/JPG/WebP/AVIF, melhorar prompt
+PRIORITY_ANIMATED = 1     # GIF, gerar post
+PRIORITY_VIDEO = 2        # MP4
+PRIORITY_BATCH = 3        # exportações em lote
+PRIORITY_PREVIEW = 4      # previews: só usam vaga que nenhuma exportação esteja esperando
+
+# Política do fluxo atual (ex: jobs já aceitos esperam sem prazo)
+_policy = contextvars.ContextVar('admission_policy', default={})
+
+
+class AdmissionRejected(Exception):
+    """Sem vaga: 429 quando a fila está cheia, 503 quando a espera estourou o prazo"""
+
+    def __init__(self, lane, status, retry_after, reason):
+        super().__init__(reason)
+        self.lane = lane
+        self.status = status
+        self.retry_after = retry_after
+
+
+def render_priority(format):
+    if format == 'mp4':
+        return PRIORITY_VIDEO
+    if format == 'gif':
+        return PRIORITY_ANIMATED
+    return PRIORITY_INTERACTIVE
+
+
+class Lane:
+    """Semáforo com fila de espera limitada, prazo e prioridade (FIFO dentro da mesma classe).
+
+    Só deve ser usado no loop compartilhado."""
+
+    def __init__(self, name, limit, max_queue=ADMIT_QUEUE_SIZE, timeout=ADMIT_QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._waiters = []  # heap de (prioridade, ordem, future)
+        self._order = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        # Média móvel do tempo de uso de uma vaga, para estimar o Retry-After
+        self.hold_avg = 1.0
+
+    def retry_after(self):
+        return max(1, min(60, math.ceil(self.hold_avg * (self.waiting + 1) / max(self.limit, 1))))
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE, patient=False, wait=True):
+        """Ocupa uma vaga; patient=True espera sem prazo nem limite de fila (trabalho já aceito).
+
+        wait=False só aceita vaga imediata (ex: hedge) e não conta como recusa."""
+        started = time.monotonic()
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if not wait:
+            raise AdmissionRejected(self.name, 503, self.retry_after(), f'Sem vaga imediata em {self.name}')
+
+        if not patient and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(
+                self.name, 429, self.retry_after(), f'Fila de {self.name} cheia ({self.waiting} aguardando)'
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, None if patient else self.timeout)
+        except asyncio.TimeoutError:
+            self.waiting -= 1
+            self.timeouts += 1
+            raise AdmissionRejected(
+                self.name, 503, self.retry_after(), f'Sem vaga em {self.name} após {self.timeout:.0f}s'
+            )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A vaga chegou junto com o cancelamento: repassa adiante
+                self.release()
+            else:
+                self.waiting -= 1
+                future.cancel()
+            raise
+        self.admitted += 1
+        self.wait_total += time.monotonic() - started
+
+    def release(self, held=None):
+        if held is not None:
+            self.hold_avg = 0.8 * self.hold_avg + 0.2 * held
+        # A vaga passa direto para o próximo da fila (mais prioritário, depois mais antigo)
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.waiting -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            'limit': self.limit,
+            'active': self.active,
+            'waiting': self.waiting,
+            'max_queue': self.max_queue,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'avg_wait_ms': round(self.wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+        }
+
+
+class AdmissionController:
+    """Controle de admissão por engine, formato e LLM com fila limitada e prioridades"""
+
+    def __init__(self, lanes):
+        self.lanes = {lane.name: lane for lane in lanes}
+
+    @asynccontextmanager
+    async def admit(self, *names, priority=PRIORITY_INTERACTIVE, wait=True):
+        """Ocupa uma vaga em cada fila (sempre na ordem recebida) durante o bloco"""
+        policy = _policy.get()
+        priority = policy.get('priority', priority)
+        acquired = []
+        try:
+            for name in names:
+                lane = self.lanes[name]
+                await lane.acquire(priority, policy.get('patient', False), wait)
+                acquired.append(lane)
+            started = time.monotonic()
+            yield
+        finally:
+            held = time.monotonic() - started if len(acquired) == len(names) else None
+            for lane in reversed(acquired):
+                lane.release(held)
+
+    def hold(self, *names, priority=PRIORITY_INTERACTIVE):
+        """Versão para código síncrono: ocupa as vagas e retorna a função que as libera"""
+        context = self.admit(*names, priority=priority)
+        background_loop.run(context.__aenter__())
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                background_loop.submit(context.__aexit__(None, None, None))
+        return release
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+@contextmanager
+def policy(priority=None, patient=False):
+    """Ajusta a admissão de tudo que rodar dentro do bloco (ex: lote com prioridade baixa)"""
+    current = dict(_policy.get())
+    if priority is not None:
+        current['priority'] = priority
+    if patient:
+        current['patient'] = True
+    token = _policy.set(current)
+    try:
+        yield
+    finally:
+        _policy.reset(token)
+
+
+def create_admission():
+    return AdmissionController([
+        Lane('playwright', ADMIT_PLAYWRIGHT_CONCURRENCY),
+        Lane('selenium', ADMIT_SELENIUM_CONCURRENCY),
+        Lane('gif', ADMIT_GIF_CONCURRENCY),
+        Lane('mp4', ADMIT_MP4_CONCURRENCY),
+        Lane('preview', ADMIT_PREVIEW_CONCURRENCY),
+        Lane('llm', ADMIT_LLM_CONCURRENCY),
+    ])
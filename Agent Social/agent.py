@@ -1,306 +1,366 @@
-from flask import Flask, render_template, request, jsonify, send_file, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, g
 import os
-import tempfile
 import asyncio
 from datetime import datetime
-import base64
 from io import BytesIO
-from openai import OpenAI
 from dotenv import load_dotenv
 import json
 import uuid
 import secrets
-
-# Importar conversores alternativos
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import atexit
+import hashlib
+import zipfile
+import multiprocessing
 import time
+from collections.abc import Mapping
 
-# Importar PIL para conversão de imagens
-from PIL import Image
-import io
-
-# Tentar importar Playwright (opcional)
-try:
-    from playwright.async_api import async_playwright
-    PLAYWRIGHT_AVAILABLE = True
-except ImportError:
-    PLAYWRIGHT_AVAILABLE = False
+# Selenium, Playwright, Pillow e o SDK da OpenAI só são importados no primeiro uso
+# (o processo sobe rápido e só paga o import do que realmente usar)
+from renderer import PLAYWRIGHT_AVAILABLE, Renderer
+if not PLAYWRIGHT_AVAILABLE:
     print("⚠️  Playwright não disponível. Usando Selenium como fallback.")
 
+from assets import AssetBundle
+from animation import resolve_capture
+from posts import post_meta, post_platform, post_viewport, with_platform
+from video import ffmpeg_available, resolve_video_settings
+from render_cache import RenderCache, render_key
+from encoding import (
+    CAPTURE_SCALE, OUTPUT_SIZES, STILL_FORMATS, check_capture, derive_sizes, format_supported, resolve_preset
+)
+from render_workers import RenderWorkerPool, RENDER_WORKERS
+from engine_router import EngineRouter
+from warmup import Warmup
+from singleflight import SingleFlight
+from preview import PREVIEW_BUDGET, PREVIEW_PRESET, PREVIEW_UPGRADE_FORMAT, resolve_preview
+from storage import create_storage
+from jobs import RenderJobQueue, QueueFull, sse_event
+from llm_cache import LLMResponseCache
+from llm_gateway import LLMGateway, LLMSetupError
+from runtime import on_shutdown, sync_view
+from admission import (
+    AdmissionRejected, PRIORITY_ANIMATED, PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_PREVIEW,
+    create_admission, policy as admission_policy, render_priority
+)
+from metrics import (
+    FALLBACKS, HTTP_SECONDS, registry, span, observe_stage,
+    gauge, collected_counter, start_trace, finish_trace
+)
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", secrets.token_hex(32))
 
-# Configurar cliente DeepSeek
-client = OpenAI(
-    api_key=os.getenv("DEEPSEEK_API_KEY"),
-    base_url="https://api.deepseek.com"
-)
+# Views async são aguardadas no loop compartilhado (browsers, LLM e jobs), em vez de um loop novo por request
+app.async_to_sync = sync_view
+
+# Configurar cliente DeepSeek (assíncrono, com pool de conexões, retries e circuit breaker)
+llm = LLMGateway(api_key=os.getenv("DEEPSEEK_API_KEY"))
 
-# Armazenamento temporário para HTML (em produção, use Redis ou similar)
-html_storage = {}
+# Cache de respostas do LLM (prompts repetidos não chamam o deepseek-reasoner de novo)
+llm_cache = LLMResponseCache()
+
+# Armazenamento temporário para HTML com TTL e limite de memória
+# (HTML_STORAGE_BACKEND=sqlite ou redis para compartilhar entre workers)
+html_storage = create_storage()
+
+# Limites de renderizações/chamadas ao LLM simultâneas, com fila limitada e prioridades
+admission = create_admission()
+
+class TemplateSet(Mapping):
+    """Templates por plataforma, montados na primeira vez que cada um é usado"""
+    
+    def __init__(self, builders):
+        self._builders = builders
+        self._built = {}
+    
+    def __getitem__(self, platform):
+        if platform not in self._built:
+            self._built[platform] = self._builders[platform]()
+        return self._built[platform]
+    
+    def __contains__(self, platform):
+        return platform in self._builders
+    
+    def __iter__(self):
+        return iter(self._builders)
+    
+    def __len__(self):
+        return len(self._builders)
 
 class SocialMediaAgent:
     def __init__(self):
-        self.templates = {
-            "instagram": self.get_instagram_template(),
-            "linkedin": self.get_linkedin_template(),
-            "twitter": self.get_twitter_template()
-        }
+        self.templates = TemplateSet({
+            "instagram": self.get_instagram_template,
+            "linkedin": self.get_linkedin_template,
+            "twitter": self.get_twitter_template
+        })
         
-        # Configurar Selenium como fallback
-        self.selenium_options = Options()
-        self.selenium_options.add_argument('--headless')
-        self.selenium_options.add_argument('--no-sandbox')
-        self.selenium_options.add_argument('--disable-dev-shm-usage')
-        self.selenium_options.add_argument('--disable-gpu')
-        self.selenium_options.add_argument('--window-size=1080,1080')
-        self.selenium_options.add_argument('--hide-scrollbars')
-        self.selenium_options.add_argument('--disable-web-security')
-    
-    def selenium_html_to_image(self, html_content, format='png'):
-        """Converte HTML para imagem usando Selenium (método confiável)"""
-        driver = None
-        temp_html_path = None
+        # Tailwind pré-compilado, fontes e ícones servidos localmente (ver build_assets.py)
+        self.assets = AssetBundle()
         
-        try:
-            # Criar arquivo HTML temporário
-            temp_html = tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8')
-            temp_html.write(html_content)
-            temp_html.close()
-            temp_html_path = temp_html.name
-            
-            # Inicializar driver
-            driver = webdriver.Chrome(options=self.selenium_options)
-            
-            # Carregar página
-            driver.get(f'file://{temp_html_path}')
-            
-            # Aguardar carregamento completo
-            time.sleep(3)  # Tempo para animações CSS
-            
-            # Definir tamanho da janela baseado na plataforma
-            if "1080px" in html_content and "1080px" in html_content:
-                driver.set_window_size(1080, 1080)
-            elif "1200px" in html_content and "630px" in html_content:
-                driver.set_window_size(1200, 630)
-            elif "1200px" in html_content and "675px" in html_content:
-                driver.set_window_size(1200, 675)
-            else:
-                driver.set_window_size(1080, 1080)
-            
-            # Capturar screenshot
-            screenshot_bytes = driver.get_screenshot_as_png()
-            
-            # Converter para o formato desejado
-            img = Image.open(io.BytesIO(screenshot_bytes))
-            
-            if format.lower() in ['jpg', 'jpeg']:
-                # Criar fundo branco para JPEG
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'RGBA':
-                    background.paste(img, mask=img.split()[-1])
-                else:
-                    background.paste(img)
-                
-                output = io.BytesIO()
-                background.save(output, format='JPEG', quality=95, optimize=True)
-                return output.getvalue()
-                
-            elif format.lower() == 'gif':
-                # Para GIF, capturar múltiplos frames
-                frames = []
-                for i in range(10):  # Capturar 10 frames
-                    time.sleep(0.3)  # Aguardar entre frames
-                    frame_bytes = driver.get_screenshot_as_png()
-                    frame_img = Image.open(io.BytesIO(frame_bytes))
-                    if frame_img.mode == 'RGBA':
-                        # Converter RGBA para RGB para GIF
-                        rgb_img = Image.new('RGB', frame_img.size, (255, 255, 255))
-                        rgb_img.paste(frame_img, mask=frame_img.split()[-1])
-                        frames.append(rgb_img)
-                    else:
-                        frames.append(frame_img)
-                
-                # Salvar como GIF animado
-                output = io.BytesIO()
-                frames[0].save(
-                    output,
-                    format='GIF',
-                    save_all=True,
-                    append_images=frames[1:],
-                    duration=300,  # 300ms entre frames
-                    loop=0,
-                    optimize=True
-                )
-                return output.getvalue()
-                
-            else:  # PNG
-                output = io.BytesIO()
-                img.save(output, format='PNG', optimize=True)
-                return output.getvalue()
-            
-        except Exception as e:
-            print(f"Erro Selenium: {e}")
-            raise Exception(f"Erro ao gerar imagem com Selenium: {str(e)}")
-        
-        finally:
-            # Cleanup
-            if driver:
-                try:
-                    driver.quit()
-                except:
-                    pass
-            
-            if temp_html_path and os.path.exists(temp_html_path):
-                try:
-                    os.unlink(temp_html_path)
-                except:
-                    pass
-
-    async def playwright_html_to_image(self, html_content, format='png'):
-        """Converte HTML para imagem usando Playwright (se disponível)"""
-        if not PLAYWRIGHT_AVAILABLE:
-            raise Exception("Playwright não está disponível")
-            
-        try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=['--no-sandbox', '--disable-setuid-sandbox']
-                )
-                page = await browser.new_page()
-                
-                # Detectar e configurar viewport baseado no conteúdo
-                if "1080px" in html_content and "1080px" in html_content:
-                    await page.set_viewport_size({"width": 1080, "height": 1080})
-                elif "1200px" in html_content and "630px" in html_content:
-                    await page.set_viewport_size({"width": 1200, "height": 630})
-                elif "1200px" in html_content and "675px" in html_content:
-                    await page.set_viewport_size({"width": 1200, "height": 675})
-                else:
-                    await page.set_viewport_size({"width": 1080, "height": 1080})
-                
-                # Carregar conteúdo e aguardar recursos
-                await page.set_content(html_content, wait_until='networkidle')
-                await page.wait_for_timeout(2000)
-                
-                if format.lower() == 'gif':
-                    # Para GIF, capturar múltiplos screenshots
-                    frames = []
-                    for i in range(10):
-                        screenshot = await page.screenshot(type='png')
-                        img = Image.open(io.BytesIO(screenshot))
-                        if img.mode == 'RGBA':
-                            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                            rgb_img.paste(img, mask=img.split()[-1])
-                            frames.append(rgb_img)
-                        else:
-                            frames.append(img)
-                        await page.wait_for_timeout(300)
-                    
-                    # Criar GIF
-                    output = io.BytesIO()
-                    frames[0].save(
-                        output,
-                        format='GIF',
-                        save_all=True,
-                        append_images=frames[1:],
-                        duration=300,
-                        loop=0,
-                        optimize=True
-                    )
-                    await browser.close()
-                    return output.getvalue()
-                    
-                else:
-                    # Screenshot normal
-                    if format.lower() in ['jpg', 'jpeg']:
-                        screenshot = await page.screenshot(type='jpeg', quality=95)
-                    else:
-                        screenshot = await page.screenshot(type='png')
-                    
-                    await browser.close()
-                    return screenshot
-                    
-        except Exception as e:
-            print(f"Erro Playwright: {e}")
-            raise Exception(f"Erro ao gerar imagem com Playwright: {str(e)}")
+        # Browsers deste processo (Chromium persistente do Playwright e drivers do Selenium)
+        self.renderer = Renderer(self.assets)
+        self.playwright_pool = self.renderer.playwright_pool
+        self.selenium_pool = self.renderer.selenium_pool
+        
+        # Cache de renderizações (memória + disco) endereçado pelo conteúdo
+        self.render_cache = RenderCache()
+        
+        # Processos de renderização (cada um com seu browser); None renderiza neste processo
+        self.render_workers = RenderWorkerPool() if RENDER_WORKERS > 0 else None
+        
+        # Escolha do engine pela saúde recente (circuito por engine, hedging opcional)
+        self.engine_router = EngineRouter(['playwright', 'selenium'] if PLAYWRIGHT_AVAILABLE else ['selenium'])
+        
+        # Drivers do Selenium pré-iniciados aqui só sem workers (cada worker pré-inicia os seus)
+        if not self.render_workers:
+            self.renderer.prestart_selenium()
+        
+        # Aquecimento opcional do engine ao iniciar (PREWARM=1); base do /readyz
+        self.warmup = Warmup()
+        
+        # Pedidos idênticos simultâneos (duplo clique, várias abas) compartilham uma execução
+        self.render_flights = SingleFlight('render')
+        self.llm_flights = SingleFlight('llm')
+    
+    async def html_to_image(self, html_content, format='png', frames=None, fps=None, on_progress=None,
+                            preview_scale=None):
+        """Converte HTML para imagem, servindo do cache quando o mesmo render já foi feito.
 
-    async def html_to_image(self, html_content, format='png'):
-        """Converte HTML para imagem - tenta Playwright primeiro, depois Selenium"""
+        preview_scale renderiza o preview rápido: reduzido, preset de encoding leve e prioridade mínima."""
         
         # Validar formato
-        valid_formats = ['png', 'jpg', 'jpeg', 'gif']
+        valid_formats = list(STILL_FORMATS) + ['gif']
         if format.lower() not in valid_formats:
             raise ValueError(f"Formato inválido: {format}. Use: {', '.join(valid_formats)}")
+        if format.lower() != 'gif' and not format_supported(format.lower()):
+            raise ValueError(f"Formato {format} não suportado neste servidor")
+        if preview_scale and format.lower() == 'gif':
+            raise ValueError("Preview só existe para formatos estáticos")
+        
+        format = format.lower()
+        key = self._image_cache_key(html_content, format, frames, fps, preview_scale)
+        
+        cached = await asyncio.to_thread(self.render_cache.get, key)
+        if cached is not None:
+            print(f"⚡ Cache hit para {format}")
+            return cached
+        
+        priority = PRIORITY_PREVIEW if preview_scale else render_priority(format)
+        lanes = ['preview'] if preview_scale else self._format_lanes([format])
+        
+        async def attempt(engine, hedge):
+            # O hedge só roda se houver vaga imediata no engine secundário
+            async with admission.admit(engine, priority=priority, wait=not hedge):
+                image_bytes = await self._dispatch(
+                    '_render_image', html_content, format, frames, fps, engine, preview_scale,
+                    on_progress=None if hedge else on_progress
+                )
+            self.warmup.mark_warm(engine)
+            return image_bytes
+        
+        async def render():
+            # Tempo total da renderização, incluindo a espera por vaga e por um worker livre
+            stage = 'preview' if preview_scale else 'render'
+            with span(stage, platform=post_platform(html_content), format=format):
+                async with admission.admit(*lanes, priority=priority):
+                    image_bytes = await self.engine_router.render(format, attempt)
+            await asyncio.to_thread(self.render_cache.put, key, image_bytes)
+            return image_bytes
+        
+        # A chave do cache (conteúdo, formato, viewport e configurações) identifica o trabalho
+        return await self.render_flights.do(key, render)
+
+    async def prewarm(self):
+        """Lança o engine e renderiza uma página de aquecimento (sem cache nem admissão).
+
+        Com workers de renderização, aquece um por worker; retorna o engine que funcionou."""
+        platform = next(iter(self.templates))
+        html_content = self.templates[platform].replace("{CONTENT}", self.fallback_content("Aquecimento"))
+        
+        async def attempt(engine, hedge):
+            await self._dispatch('_render_image', html_content, 'png', None, None, engine)
+            return engine
+        
+        count = self.render_workers.size if self.render_workers else 1
+        results = await asyncio.gather(
+            *(self.engine_router.render('png', attempt) for _ in range(count)), return_exceptions=True
+        )
+        engines = [result for result in results if not isinstance(result, BaseException)]
+        if not engines:
+            raise results[0]
+        return engines[0]
+
+    async def _dispatch(self, method, *args, on_progress=None):
+        """Executa um método do Renderer num worker (ou aqui mesmo, sem pool de workers)"""
+        if self.render_workers:
+            return await self.render_workers.call(method, *args, on_progress=on_progress)
+        return await getattr(self.renderer, method)(*args, on_progress=on_progress)
+
+    def _format_lanes(self, formats):
+        """Filas de admissão dos formatos caros (a vaga do engine é pedida a cada tentativa)"""
+        return [f for f in ('gif', 'mp4') if f in formats]
+
+    def _image_cache_key(self, html_content, format, frames=None, fps=None, preview_scale=None):
+        if format == 'gif':
+            settings = dict(zip(('frames', 'fps'), resolve_capture(frames, fps)))
+        elif preview_scale:
+            settings = {'preset': resolve_preset(PREVIEW_PRESET), 'preview_scale': preview_scale}
+        else:
+            settings = {'preset': resolve_preset()}
+        return render_key(html_content, format, post_viewport(html_content), settings)
+
+    async def render_formats(self, html_content, formats, frames=None, fps=None, errors=None):
+        """Renderiza vários formatos de imagem carregando a página uma única vez.
+
+        Com errors (dict), formatos que falharem em todos os engines ficam fora do resultado
+        com o motivo em errors[formato]; sem ele a primeira falha é propagada."""
+        # Estáticos primeiro: o GIF pausa as animações da página
+        formats = sorted(dict.fromkeys(f.lower() for f in formats), key=lambda f: f == 'gif')
+        keys = {f: self._image_cache_key(html_content, f, frames, fps) for f in formats}
+        
+        results = {}
+        for f in formats:
+            cached = await asyncio.to_thread(self.render_cache.get, keys[f])
+            if cached is not None:
+                results[f] = cached
         
-        # Tentar Playwright primeiro (se disponível)
-        if PLAYWRIGHT_AVAILABLE:
+        missing = [f for f in formats if f not in results]
+        if missing and self.engine_router.healthy('playwright'):
+            async def attempt(engine, hedge):
+                async with admission.admit(*self._format_lanes(missing), engine, priority=PRIORITY_BATCH):
+                    return await self._dispatch('_render_formats', html_content, missing, frames, fps)
+            
+            async def render():
+                # Passa pelo circuito do Playwright: falhas do lote contam para a saúde do engine
+                return await self.engine_router.render_with('playwright', 'batch', attempt)
+            
             try:
-                print(f"🎭 Tentando Playwright para {format}...")
-                return await self.playwright_html_to_image(html_content, format)
+                rendered = await self.render_flights.do(tuple(keys[f] for f in missing), render)
+            except AdmissionRejected:
+                raise
             except Exception as e:
-                print(f"❌ Playwright falhou: {e}")
-                print("🔄 Usando Selenium como fallback...")
+                print(f"❌ Falha no render em lote, seguindo formato a formato: {e}")
+                rendered = {}
+            for f, data in rendered.items():
+                results[f] = data
+                await asyncio.to_thread(self.render_cache.put, keys[f], data)
         
-        # Fallback para Selenium
-        try:
-            print(f"🌐 Usando Selenium para {format}...")
-            return self.selenium_html_to_image(html_content, format)
-        except Exception as e:
-            print(f"❌ Selenium também falhou: {e}")
-            raise Exception("Todos os métodos de conversão falharam")
+        # O que faltar segue o caminho normal (roteador de engines, com fallback)
+        for f in formats:
+            if f in results:
+                continue
+            try:
+                results[f] = await self.html_to_image(html_content, f, frames, fps)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                if errors is None:
+                    raise
+                errors[f] = str(e)
+        return results
 
-    async def html_to_mp4(self, html_content, duration=5):
-        """Gera MP4 - fallback para imagem estática se vídeo não funcionar"""
+    async def render_sizes(self, html_content, formats, sizes):
+        """Vários tamanhos (retina, standard, thumbnail) x formatos estáticos com uma única passada no browser.
+
+        A página é capturada uma vez em CAPTURE_SCALE e cada saída é derivada dessa captura com o Pillow.
+        Retorna {(formato, tamanho): bytes}."""
+        formats = list(dict.fromkeys(f.lower() for f in formats))
+        sizes = list(dict.fromkeys(sizes))
+        for f in formats:
+            if f not in STILL_FORMATS or not format_supported(f):
+                raise ValueError(f"Formato {f} não suportado em vários tamanhos")
+        for size in sizes:
+            if size not in OUTPUT_SIZES:
+                raise ValueError(f"Tamanho inválido: {size}. Use: {', '.join(OUTPUT_SIZES)}")
         
-        if PLAYWRIGHT_AVAILABLE:
-            try:
+        viewport = post_viewport(html_content)
+        preset = resolve_preset()
+        keys = {
+            (f, size): render_key(html_content, f, viewport, {'preset': preset, 'size': size})
+            for f in formats for size in sizes
+        }
+        
+        results = {}
+        for output, key in keys.items():
+            cached = await asyncio.to_thread(self.render_cache.get, key)
+            if cached is not None:
+                results[output] = cached
+        
+        missing = [output for output in keys if output not in results]
+        if missing:
+            capture = await self._capture(html_content)
+            derived = await asyncio.to_thread(derive_sizes, capture, viewport, missing, preset)
+            for output, data in derived.items():
+                results[output] = data
+                await asyncio.to_thread(self.render_cache.put, keys[output], data)
+        return results
+
+    async def _capture(self, html_content):
+        """PNG da página em CAPTURE_SCALE (cacheado: novos tamanhos do mesmo post não voltam ao browser)"""
+        key = render_key(html_content, 'capture', post_viewport(html_content), {'scale': CAPTURE_SCALE})
+        cached = await asyncio.to_thread(self.render_cache.get, key)
+        if cached is not None:
+            return cached
+        
+        priority = render_priority('png')
+        
+        async def attempt(engine, hedge):
+            async with admission.admit(engine, priority=priority, wait=not hedge):
+                capture = await self._dispatch('_render_capture', html_content, CAPTURE_SCALE, engine)
+            # Captura sem o device scale factor (ex: override do Selenium ignorado) não vai para o
+            # cache; o roteador tenta o outro engine
+            check_capture(capture, post_viewport(html_content), CAPTURE_SCALE)
+            self.warmup.mark_warm(engine)
+            return capture
+        
+        async def render():
+            with span('render', platform=post_platform(html_content), format='capture'):
+                capture = await self.engine_router.render('capture', attempt)
+            await asyncio.to_thread(self.render_cache.put, key, capture)
+            return capture
+        
+        return await self.render_flights.do(key, render)
+
+    async def html_to_mp4(self, html_content, duration=5, fps=None, crf=None, bitrate=None, faststart=None,
+                          on_progress=None):
+        """Gera MP4 H.264 - fallback para imagem estática se vídeo não funcionar"""
+        settings = resolve_video_settings(duration, fps, crf, bitrate, faststart)
+        
+        if PLAYWRIGHT_AVAILABLE and ffmpeg_available() and self.engine_router.healthy('playwright'):
+            key = render_key(html_content, 'mp4', post_viewport(html_content), settings)
+            cached = await asyncio.to_thread(self.render_cache.get, key)
+            if cached is not None:
+                print("⚡ Cache hit para mp4")
+                return cached
+            
+            async def render():
                 print("🎬 Tentando gerar vídeo com Playwright...")
-                async with async_playwright() as p:
-                    browser = await p.chromium.launch(
-                        headless=True,
-                        args=['--no-sandbox', '--disable-setuid-sandbox']
-                    )
-                    page = await browser.new_page()
-                    
-                    # Configurar viewport
-                    await page.set_viewport_size({"width": 1080, "height": 1080})
-                    
-                    # Carregar conteúdo
-                    await page.set_content(html_content, wait_until='networkidle')
-                    await page.wait_for_timeout(2000)
-                    
-                    # Criar arquivo temporário para vídeo
-                    temp_video = tempfile.NamedTemporaryFile(delete=False, suffix='.webm')
-                    temp_video.close()
-                    
-                    # Iniciar gravação
-                    await page.video.start(path=temp_video.name)
-                    
-                    # Gravar por duração especificada
-                    await page.wait_for_timeout(duration * 1000)
-                    
-                    # Parar gravação
-                    await page.video.stop()
-                    await browser.close()
-                    
-                    # Ler arquivo
-                    with open(temp_video.name, 'rb') as f:
-                        video_bytes = f.read()
-                    
-                    os.unlink(temp_video.name)
-                    return video_bytes
-                    
+                with span('render', platform=post_platform(html_content), format='mp4'):
+                    async with admission.admit('mp4', 'playwright', priority=render_priority('mp4')):
+                        video_bytes = await self._dispatch(
+                            '_render_video', html_content, settings, on_progress=on_progress
+                        )
+                await asyncio.to_thread(self.render_cache.put, key, video_bytes)
+                return video_bytes
+            
+            try:
+                return await self.render_flights.do(key, render)
+            except AdmissionRejected:
+                raise
             except Exception as e:
                 print(f"❌ Vídeo falhou: {e}")
+        elif not ffmpeg_available():
+            print("⚠️  ffmpeg não disponível para gerar vídeo")
+        elif PLAYWRIGHT_AVAILABLE:
+            print("⚠️  Playwright com circuito aberto, pulando o vídeo")
         
         # Fallback: criar "vídeo" estático (imagem como MP4)
         print("📸 Gerando imagem estática como fallback...")
+        FALLBACKS.inc(kind='video_to_image')
         image_bytes = await self.html_to_image(html_content, 'png')
         
         # Retornar imagem (front-end vai tratar como "vídeo")
@@ -313,6 +373,7 @@ class SocialMediaAgent:
         <head>
             <meta charset="UTF-8">
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <meta name="agent-social-platform" content="instagram">
             <title>Instagram Post</title>
             <script src="https://cdn.tailwindcss.com"></script>
             <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&display=swap" rel="stylesheet">
@@ -383,6 +444,7 @@ class SocialMediaAgent:
         <head>
             <meta charset="UTF-8">
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <meta name="agent-social-platform" content="linkedin">
             <title>LinkedIn Post</title>
             <script src="https://cdn.tailwindcss.com"></script>
             <link href="https://fonts.googleapis.com/css2?family=Source+Sans+Pro:wght@400;600;700&display=swap" rel="stylesheet">
@@ -407,6 +469,7 @@ class SocialMediaAgent:
         <head>
             <meta charset="UTF-8">
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <meta name="agent-social-platform" content="twitter">
             <title>Twitter Post</title>
             <script src="https://cdn.tailwindcss.com"></script>
             <link href="https://fonts.googleapis.com/css2?family=Twitter+Chirp:wght@400;700&display=swap" rel="stylesheet">
@@ -424,8 +487,8 @@ class SocialMediaAgent:
         </html>
         """
 
-    def generate_post_content(self, prompt, platform="instagram"):
-        """Gera conteúdo do post usando DeepSeek Reasoner"""
+    def post_messages(self, prompt, platform="instagram"):
+        """Mensagens enviadas ao DeepSeek Reasoner para gerar o conteúdo do post"""
         platform_specs = {
             "instagram": "1080x1080px, visual impactante, cores vibrantes, foco em engajamento",
             "linkedin": "1200x630px, profissional, corporativo, foco em networking",
@@ -451,19 +514,14 @@ class SocialMediaAgent:
         RETORNE APENAS O HTML DO CONTEÚDO, SEM EXPLICAÇÕES.
         """
         
-        try:
-            response = client.chat.completions.create(
-                model="deepseek-reasoner",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Crie um post sobre: {prompt}"}
-                ],
-                temperature=0.8
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Erro ao gerar conteúdo: {e}")
-            return f"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Crie um post sobre: {prompt}"}
+        ]
+
+    def fallback_content(self, prompt):
+        """Conteúdo usado quando o LLM não responde"""
+        return f"""
             <div class="text-center text-white p-8">
                 <i class="fas fa-image text-6xl mb-4 animate-pulse-slow"></i>
                 <h1 class="text-5xl font-bold mb-4 animate-float">{prompt}</h1>
@@ -476,26 +534,236 @@ class SocialMediaAgent:
             </div>
             """
 
-    def create_post(self, prompt, platform="instagram"):
+    async def generate_post_content(self, prompt, platform="instagram", regenerate=False):
+        """Gera conteúdo do post usando DeepSeek Reasoner"""
+        cache_key = llm_cache.key('post', prompt, "deepseek-reasoner", platform=platform, temperature=0.8)
+        # Cache em SQLite: consultado fora do loop compartilhado
+        cached = await asyncio.to_thread(llm_cache.get, cache_key, regenerate)
+        if cached is not None:
+            return cached
+        
+        # Chamadas idênticas em andamento (mesmo prompt, plataforma e parâmetros) são reaproveitadas
+        return await self.llm_flights.do(
+            (cache_key, regenerate), lambda: self._generate_post_content(prompt, platform, cache_key)
+        )
+
+    async def _generate_post_content(self, prompt, platform, cache_key):
+        try:
+            # AdmissionRejected não cai no conteúdo de fallback: vira 429/503 para o cliente
+            async with admission.admit('llm', priority=PRIORITY_ANIMATED):
+                with span('llm', platform=platform, engine='deepseek-reasoner'):
+                    response = await llm.chat(
+                        model="deepseek-reasoner",
+                        messages=self.post_messages(prompt, platform),
+                        temperature=0.8
+                    )
+            content = (response.choices[0].message.content or '').strip()
+            if content:
+                await asyncio.to_thread(
+                    llm_cache.put, cache_key, content, response.usage.total_tokens if response.usage else 0
+                )
+            return content
+        except (AdmissionRejected, LLMSetupError):
+            # Erro de configuração não vira conteúdo genérico: o cliente recebe o erro
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar conteúdo: {e}")
+            FALLBACKS.inc(kind='llm_fallback_content')
+            return self.fallback_content(prompt)
+
+    def stream_post_content(self, prompt, platform="instagram", regenerate=False):
+        """Gera o conteúdo em streaming: produz ('reasoning'|'content', delta) e por fim ('final', conteúdo)"""
+        cache_key = llm_cache.key('post', prompt, "deepseek-reasoner", platform=platform, temperature=0.8)
+        cached = llm_cache.get(cache_key, regenerate)
+        if cached is not None:
+            yield 'final', cached
+            return
+        
+        labels = {'platform': platform, 'engine': 'deepseek-reasoner'}
+        started = time.perf_counter()
+        try:
+            stream = llm.stream(
+                model="deepseek-reasoner",
+                messages=self.post_messages(prompt, platform),
+                temperature=0.8,
+                stream_options={"include_usage": True}
+            )
+            
+            parts = []
+            tokens = 0
+            first = True
+            for chunk in stream:
+                if first:
+                    # Tempo até o primeiro token: o que o usuário espera antes de ver algo
+                    observe_stage('llm_first_token', time.perf_counter() - started, **labels)
+                    first = False
+                if chunk.usage:
+                    tokens = chunk.usage.total_tokens
+                if not chunk.choices:
+                    continue
+                
+                delta = chunk.choices[0].delta
+                # deepseek-reasoner envia o raciocínio em um campo próprio
+                reasoning = getattr(delta, 'reasoning_content', None)
+                if reasoning:
+                    yield 'reasoning', reasoning
+                if delta.content:
+                    parts.append(delta.content)
+                    yield 'content', delta.content
+            
+            content = ''.join(parts).strip()
+            observe_stage('llm', time.perf_counter() - started, **labels)
+            # Stream vazio (conexão cortada, só raciocínio) não vai para o cache: seria servido até o TTL expirar
+            if content:
+                llm_cache.put(cache_key, content, tokens)
+            yield 'final', content
+        except LLMSetupError:
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar conteúdo (stream): {e}")
+            FALLBACKS.inc(kind='llm_fallback_content')
+            yield 'final', self.fallback_content(prompt)
+
+    async def create_post(self, prompt, platform="instagram", regenerate=False):
         """Cria post completo"""
         template = self.templates[platform]
-        content = self.generate_post_content(prompt, platform)
+        content = await self.generate_post_content(prompt, platform, regenerate)
         html = template.replace("{CONTENT}", content)
         return html
 
 # Instanciar o agente
 agent = SocialMediaAgent()
 
+# Fila de renderização assíncrona (POST /jobs)
+render_jobs = RenderJobQueue()
+
+# Os processos de renderização aquecem o próprio browser ao iniciar; aqui só o processo web
+if multiprocessing.parent_process() is None:
+    agent.warmup.start(agent.prewarm)
+
+if agent.playwright_pool:
+    on_shutdown(agent.playwright_pool.close)
+if agent.render_workers:
+    on_shutdown(agent.render_workers.close)
+on_shutdown(llm.close)
+atexit.register(agent.selenium_pool.close)
+
+# Métricas lidas dos componentes na hora da coleta (GET /metrics)
+storage_usage = {}
+
+@registry.on_collect
+def collect_storage_usage():
+    # Uma consulta ao backend por coleta, lida pelas duas gauges
+    storage_usage.clear()
+    storage_usage.update(html_storage.stats())
+
+gauge('agent_html_storage_entries', 'HTMLs armazenados', lambda: storage_usage['entries'])
+gauge('agent_html_storage_bytes', 'Tamanho do armazenamento de HTML', lambda: storage_usage['bytes'])
+collected_counter(
+    'agent_render_cache_lookups_total', 'Consultas ao cache de renderização',
+    lambda: {
+        'memory_hit': agent.render_cache.memory_hits,
+        'disk_hit': agent.render_cache.disk_hits,
+        'miss': agent.render_cache.misses
+    },
+    'result'
+)
+collected_counter(
+    'agent_llm_cache_lookups_total', 'Consultas ao cache do LLM',
+    lambda: {'hit': llm_cache.hits, 'miss': llm_cache.misses, 'bypass': llm_cache.bypasses},
+    'result'
+)
+collected_counter('agent_llm_cache_saved_tokens_total', 'Tokens do LLM economizados por acertos no cache',
+                  lambda: llm_cache.saved_tokens)
+gauge(
+    'agent_jobs', 'Jobs de renderização por status',
+    lambda: {key: render_jobs.stats()[key] for key in ('queued', 'running')},
+    'status'
+)
+gauge('agent_llm_in_flight', 'Chamadas ao LLM em andamento', lambda: llm.in_flight)
+collected_counter(
+    'agent_llm_calls_total', 'Chamadas ao LLM por resultado',
+    lambda: {'call': llm.calls, 'retry': llm.retries, 'failure': llm.failures, 'timeout': llm.timeouts},
+    'result'
+)
+gauge('agent_llm_circuit_open', 'Circuit breaker do LLM aberto (1) ou fechado (0)',
+      lambda: int(llm.breaker.state != 'closed'))
+if agent.render_workers:
+    gauge(
+        'agent_render_workers', 'Workers de renderização por estado',
+        lambda: {key: agent.render_workers.stats()[key] for key in ('alive', 'busy', 'idle')},
+        'state'
+    )
+    collected_counter('agent_render_worker_restarts_total', 'Workers reiniciados após queda ou travamento',
+                      lambda: agent.render_workers.restarts)
+
+gauge('agent_admission_active', 'Vagas ocupadas por fila de admissão',
+      lambda: {name: lane['active'] for name, lane in admission.stats().items()}, 'lane')
+gauge('agent_admission_waiting', 'Requests aguardando vaga por fila de admissão',
+      lambda: {name: lane['waiting'] for name, lane in admission.stats().items()}, 'lane')
+collected_counter('agent_admission_rejected_total', 'Requests recusados (429 fila cheia, 503 prazo)',
+                  lambda: {name: lane['rejected'] + lane['timeouts'] for name, lane in admission.stats().items()},
+                  'lane')
+
+gauge('agent_engine_circuit_open', 'Circuito do engine de renderização aberto (1) ou não (0)',
+      lambda: {name: int(engine.breaker.state == 'open') for name, engine in agent.engine_router.engines.items()},
+      'engine')
+gauge('agent_engine_success_rate', 'Taxa de sucesso do engine na janela recente',
+      lambda: {name: engine.success_rate() for name, engine in agent.engine_router.engines.items()}, 'engine')
+collected_counter('agent_engine_hedges_total', 'Renderizações em que o engine foi disparado como hedge',
+                  lambda: {name: engine.hedges for name, engine in agent.engine_router.engines.items()}, 'engine')
+collected_counter('agent_coalesced_total', 'Requests atendidos por uma execução idêntica já em andamento',
+                  lambda: {'render': agent.render_flights.coalesced, 'llm': agent.llm_flights.coalesced}, 'kind')
+gauge('agent_ready', 'Processo pronto para tráfego (1) ou aquecendo (0)', lambda: int(readiness()[0]))
+gauge('agent_warmup_seconds', 'Segundos do início do processo até a primeira renderização bem-sucedida',
+      lambda: agent.warmup.seconds)
+
+@app.errorhandler(QueueFull)
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    """Sobrecarga: resposta rápida com Retry-After em vez de enfileirar sem limite"""
+    response = jsonify({
+        'error': str(error), 'lane': getattr(error, 'lane', 'jobs'), 'retry_after': error.retry_after
+    })
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    # Trace por request: TRACE_REQUESTS=1 ou header X-Trace: 1
+    g.trace_id = start_trace(request.headers.get('X-Trace') == '1')
+
+@app.after_request
+def tag_request_metrics(response):
+    g.status = response.status_code
+    if g.get('trace_id'):
+        response.headers['X-Trace-Id'] = g.trace_id
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Roda depois do streaming (SSE) terminar, então a duração inclui o corpo inteiro
+    if 'request_started' not in g:
+        return
+    duration = time.perf_counter() - g.request_started
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = g.get('status', 500)
+    HTTP_SECONDS.observe(duration, endpoint=endpoint, method=request.method, status=status)
+    finish_trace(method=request.method, path=request.path, status=status, ms=round(duration * 1000, 1))
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/enhance-prompt', methods=['POST'])
-def enhance_prompt():
+async def enhance_prompt():
     """Melhora/expande o prompt do usuário usando IA"""
     data = request.get_json()
     original_prompt = data.get('prompt', '')
     platform = data.get('platform', 'instagram')
+    regenerate = bool(data.get('regenerate'))
     
     if not original_prompt:
         return jsonify({'error': 'Prompt é obrigatório'}), 400
@@ -527,17 +795,28 @@ def enhance_prompt():
         Retorne APENAS o prompt melhorado, sem explicações adicionais.
         """
         
-        response = client.chat.completions.create(
-            model="deepseek-reasoner",
-            messages=[
-                {"role": "system", "content": "Você é um expert em marketing digital e copywriting para redes sociais."},
-                {"role": "user", "content": enhancement_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=300
+        cache_key = llm_cache.key(
+            'enhance', original_prompt, "deepseek-reasoner", platform=platform, temperature=0.7, max_tokens=300
         )
+        enhanced = await asyncio.to_thread(llm_cache.get, cache_key, regenerate)
         
-        enhanced = response.choices[0].message.content.strip()
+        if enhanced is None:
+            async with admission.admit('llm', priority=PRIORITY_INTERACTIVE):
+                with span('llm', platform=platform, engine='deepseek-reasoner'):
+                    response = await llm.chat(
+                        model="deepseek-reasoner",
+                        messages=[
+                            {"role": "system", "content": "Você é um expert em marketing digital e copywriting para redes sociais."},
+                            {"role": "user", "content": enhancement_prompt}
+                        ],
+                        temperature=0.7,
+                        max_tokens=300
+                    )
+            
+            enhanced = response.choices[0].message.content.strip()
+            await asyncio.to_thread(
+                llm_cache.put, cache_key, enhanced, response.usage.total_tokens if response.usage else 0
+            )
         
         return jsonify({
             'success': True,
@@ -545,8 +824,14 @@ def enhance_prompt():
             'original_prompt': original_prompt
         })
         
+    except AdmissionRejected:
+        raise
+    except LLMSetupError as e:
+        print(f"❌ {e}")
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         print(f"Erro ao melhorar prompt: {e}")
+        FALLBACKS.inc(kind='llm_fallback_content')
         # Fallback: retornar prompt com melhorias básicas
         fallback_enhanced = f"{original_prompt}. Design moderno e atrativo para {platform}, com cores vibrantes, elementos visuais impactantes, foco no público-alvo da plataforma, incluindo call-to-action relevante."
         return jsonify({
@@ -557,113 +842,445 @@ def enhance_prompt():
         })
 
 @app.route('/generate', methods=['POST'])
-def generate_post():
+async def generate_post():
     data = request.get_json()
     prompt = data.get('prompt', '')
     platform = data.get('platform', 'instagram')
+    regenerate = bool(data.get('regenerate'))
     
     if not prompt:
         return jsonify({'error': 'Prompt é obrigatório'}), 400
     
     try:
-        html_content = agent.create_post(prompt, platform)
+        html_content = await agent.create_post(prompt, platform, regenerate)
         
-        # Armazenar HTML temporariamente
+        # Armazenar HTML temporariamente, com plataforma e viewport explícitos
         content_id = str(uuid.uuid4())
-        html_storage[content_id] = html_content
+        meta = post_meta(platform)
+        await asyncio.to_thread(html_storage.set, content_id, html_content, meta)
         
         return jsonify({
             'success': True,
             'html': html_content,
             'content_id': content_id,
+            'meta': meta,
             'timestamp': datetime.now().isoformat()
         })
+    except AdmissionRejected:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/download', methods=['POST'])
-def download_file():
-    """Nova rota usando POST para download"""
-    data = request.get_json()
-    
-    # Obter parâmetros
+# Formatos aceitos para download e seus tipos
+DOWNLOAD_FORMATS = ['png', 'jpg', 'jpeg', 'webp', 'avif', 'gif', 'mp4']
+MIMETYPES = {
+    'png': ('image/png', 'png'),
+    'jpg': ('image/jpeg', 'jpg'),
+    'jpeg': ('image/jpeg', 'jpg'),
+    'webp': ('image/webp', 'webp'),
+    'avif': ('image/avif', 'avif'),
+    'gif': ('image/gif', 'gif'),
+    'mp4': ('video/mp4', 'mp4'),
+}
+
+def read_render_request(data):
+    """Extrai e valida os parâmetros de renderização comuns a /download e /jobs"""
     format = data.get('format', 'png').lower()
-    html_content = data.get('html', '')
-    content_id = data.get('content_id', '')
-    duration = int(data.get('duration', 5))
     
-    # Tentar obter HTML do storage se content_id fornecido
-    if content_id and content_id in html_storage:
-        html_content = html_storage[content_id]
+    # Tentar obter HTML do storage se content_id fornecido; a plataforma vem dos metadados
+    # gravados com ele ou, para HTML enviado direto, do campo platform
+    html_content, meta = html_storage.get_post(data.get('content_id', ''))
+    html_content = html_content or data.get('html', '')
     
     if not html_content:
-        return jsonify({'error': 'HTML content is required'}), 400
+        raise ValueError('HTML content is required')
     
-    # Validar formato
-    valid_formats = ['png', 'jpg', 'jpeg', 'gif', 'mp4']
-    if format not in valid_formats:
-        return jsonify({'error': f'Invalid format. Use: {", ".join(valid_formats)}'}), 400
+    if format not in DOWNLOAD_FORMATS:
+        raise ValueError(f'Invalid format. Use: {", ".join(DOWNLOAD_FORMATS)}')
     
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        if format == 'mp4':
-            # Gerar vídeo
-            file_bytes = loop.run_until_complete(agent.html_to_mp4(html_content, duration))
-            mimetype = 'video/mp4'
-            file_ext = 'mp4'
-        else:
-            # Gerar imagem (PNG, JPG, JPEG, GIF)
-            file_bytes = loop.run_until_complete(agent.html_to_image(html_content, format))
-            
-            if format == 'gif':
-                mimetype = 'image/gif'
-                file_ext = 'gif'
-            elif format in ['jpg', 'jpeg']:
-                mimetype = 'image/jpeg'
-                file_ext = 'jpg'
-            else:
-                mimetype = 'image/png'
-                file_ext = 'png'
-            
-        loop.close()
-        
-        # Criar nome de arquivo único
-        filename = f'post_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:8]}.{file_ext}'
-        
-        # Criar arquivo temporário
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}')
-        temp_file.write(file_bytes)
-        temp_file.close()
-        
-        # Enviar arquivo
-        response = send_file(
-            temp_file.name,
-            as_attachment=True,
-            download_name=filename,
-            mimetype=mimetype
+    size = data.get('size') or 'standard'
+    if size not in OUTPUT_SIZES:
+        raise ValueError(f'Invalid size. Use: {", ".join(OUTPUT_SIZES)}')
+    if size != 'standard' and format not in STILL_FORMATS:
+        raise ValueError(f'Size {size} is only available for {", ".join(STILL_FORMATS)}')
+    
+    html_content = with_platform(html_content, meta.get('platform') or data.get('platform'))
+    options = {key: data.get(key) for key in ('duration', 'frames', 'fps', 'crf', 'bitrate', 'faststart')}
+    options['size'] = size
+    return html_content, format, options
+
+def flag(value):
+    """Booleano vindo de JSON ou da query string ('1', 'true', 'yes', 'on'; '0' e 'false' são falsos)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def artifact_etag(html_content, format, options):
+    """ETag a partir da identidade da renderização (conteúdo, formato, viewport e configurações),
+    como a chave do cache: não precisa reler os bytes do artefato a cada resposta ou Range"""
+    settings = {**options, 'preset': resolve_preset()}
+    return render_key(html_content, format, post_viewport(html_content), settings)
+
+def send_artifact(file_bytes, mimetype, filename, etag, as_attachment=True):
+    """Entrega o artefato direto da memória, com Content-Length, ETag e Range (seek de MP4).
+
+    Range impossível de atender levanta RequestedRangeNotSatisfiable (416): chame fora do try
+    que converte erros de renderização em 500."""
+    response = Response(file_bytes, mimetype=mimetype)
+    response.headers.set('Content-Disposition', 'attachment' if as_attachment else 'inline', filename=filename)
+    # Conteúdo imutável para a mesma identidade: ETag forte para If-None-Match / If-Range
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    
+    # Envio termina quando o servidor fecha a resposta (último byte entregue ou cliente desconectou)
+    started = time.perf_counter()
+    format = filename.rsplit('.', 1)[-1]
+    response.call_on_close(lambda: observe_stage('response_send', time.perf_counter() - started, format=format))
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(file_bytes))
+
+async def render_artifact(html_content, format, options, on_progress=None):
+    """Renderiza o artefato pedido e retorna (bytes, mimetype, nome do arquivo)"""
+    if format == 'mp4':
+        # Gerar vídeo
+        file_bytes = await agent.html_to_mp4(
+            html_content,
+            float(options.get('duration') or 5),
+            fps=options.get('fps'),
+            crf=options.get('crf'),
+            bitrate=options.get('bitrate'),
+            faststart=options.get('faststart'),
+            on_progress=on_progress
         )
+    elif options.get('size', 'standard') != 'standard':
+        # Retina ou miniatura: derivados da captura em alta densidade (cacheada por post)
+        size = options['size']
+        file_bytes = (await agent.render_sizes(html_content, [format], [size]))[(format, size)]
+    else:
+        # Gerar imagem (PNG, JPG, JPEG, GIF)
+        file_bytes = await agent.html_to_image(
+            html_content, format, options.get('frames'), options.get('fps'), on_progress
+        )
+    
+    mimetype, file_ext = MIMETYPES[format]
+    
+    # Criar nome de arquivo único
+    suffix = size_suffix(options.get('size', 'standard'))
+    filename = f'post_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:8]}{suffix}.{file_ext}'
+    return file_bytes, mimetype, filename
+
+def size_suffix(size):
+    """Sufixo do nome do arquivo para cada tamanho de saída"""
+    return {'retina': '@2x', 'thumbnail': '_thumb'}.get(size, '')
+
+async def render_batch(prompt, platforms, formats, options, output='zip', on_progress=None, regenerate=False,
+                       sizes=None):
+    """Gera o post de cada plataforma em paralelo e exporta a matriz de formatos (e tamanhos)"""
+    sizes = list(sizes or ['standard'])
+    # Gerações do LLM em paralelo
+    htmls = await asyncio.gather(*(
+        agent.create_post(prompt, platform, regenerate) for platform in platforms
+    ))
+    
+    image_formats = [f for f in formats if f != 'mp4']
+    completed = 0
+    
+    async def export(platform, html_content):
+        nonlocal completed
+        content_id = str(uuid.uuid4())
+        await asyncio.to_thread(html_storage.set, content_id, html_content, post_meta(platform))
         
-        # Agendar remoção do arquivo após envio
-        @response.call_on_close
-        def cleanup():
+        # Artefatos por (formato, tamanho); GIF e MP4 só existem no tamanho padrão.
+        # Falhas viram entradas de erro no manifesto em vez de sumirem do ZIP
+        artifacts = {}
+        errors = {}
+        batch_formats = image_formats
+        if sizes != ['standard']:
+            # Uma única captura em alta densidade para todos os tamanhos dos formatos estáticos
+            still = [f for f in image_formats if f in STILL_FORMATS]
+            try:
+                artifacts = await agent.render_sizes(html_content, still, sizes)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                errors.update(((f, size), str(e)) for f in still for size in sizes)
+            batch_formats = [f for f in image_formats if f not in still]
+        if batch_formats:
+            # Uma única carga de página para todos os formatos de imagem
+            failed = {}
+            rendered = await agent.render_formats(
+                html_content, batch_formats, options.get('frames'), options.get('fps'), errors=failed
+            )
+            artifacts.update(((f, 'standard'), data) for f, data in rendered.items())
+            errors.update(((f, 'standard'), error) for f, error in failed.items())
+        if 'mp4' in formats:
             try:
-                if os.path.exists(temp_file.name):
-                    os.unlink(temp_file.name)
-                # Limpar storage se necessário
-                if content_id in html_storage:
-                    del html_storage[content_id]
-            except:
-                pass
+                artifacts['mp4', 'standard'] = (await render_artifact(html_content, 'mp4', options))[0]
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                errors['mp4', 'standard'] = str(e)
+        for (f, size), error in errors.items():
+            print(f"❌ Lote: {platform} {f} ({size}) falhou: {error}")
         
-        return response
+        completed += 1
+        if on_progress:
+            on_progress(completed, len(platforms))
+        return platform, content_id, artifacts, errors
+    
+    exported = await asyncio.gather(*(
+        export(platform, html_content) for platform, html_content in zip(platforms, htmls)
+    ))
+    if not any(artifacts for _, _, artifacts, _ in exported):
+        failures = '; '.join(error for _, _, _, errors in exported for error in errors.values())
+        raise Exception(f"Nenhum artefato do lote foi gerado: {failures}")
+    
+    # Hash e ZIP de vários MB: fora do loop compartilhado
+    return await asyncio.to_thread(package_batch, prompt, exported, output)
+
+def package_batch(prompt, exported, output):
+    """Monta o manifesto (com sha256 de cada artefato) e o ZIP do lote"""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    manifest = {'prompt': prompt, 'created_at': datetime.now().isoformat(), 'posts': []}
+    files = []
+    for platform, content_id, artifacts, errors in exported:
+        entries = []
+        for (format, size), file_bytes in artifacts.items():
+            mimetype, file_ext = MIMETYPES[format]
+            filename = f'{platform}/post_{platform}_{stamp}{size_suffix(size)}.{file_ext}'
+            files.append((filename, file_bytes))
+            entries.append({
+                'format': format,
+                'output_size': size,
+                'filename': filename,
+                'mimetype': mimetype,
+                'size': len(file_bytes),
+                'sha256': hashlib.sha256(file_bytes).hexdigest()
+            })
+        # Formatos que falharam aparecem com o motivo (o ZIP não tem o arquivo)
+        entries.extend(
+            {'format': format, 'output_size': size, 'error': error} for (format, size), error in errors.items()
+        )
+        manifest['posts'].append({
+            **post_meta(platform), 'content_id': content_id, 'artifacts': entries
+        })
+    
+    if output == 'manifest':
+        # Artefatos ficam no cache: POST /download com content_id + format devolve na hora
+        return json.dumps(manifest, ensure_ascii=False).encode('utf-8'), 'application/json', f'batch_{stamp}.json'
+    
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for filename, file_bytes in files:
+            archive.writestr(filename, file_bytes)
+        archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    return buffer.getvalue(), 'application/zip', f'batch_{stamp}.zip'
+
+@app.route('/generate-stream', methods=['POST'])
+def generate_post_stream():
+    """Gera o post transmitindo raciocínio e conteúdo via Server-Sent Events"""
+    data = request.get_json()
+    prompt = data.get('prompt', '')
+    platform = data.get('platform', 'instagram')
+    regenerate = bool(data.get('regenerate'))
+    
+    if not prompt:
+        return jsonify({'error': 'Prompt é obrigatório'}), 400
+    
+    if platform not in agent.templates:
+        return jsonify({'error': f'Plataforma inválida: {platform}'}), 400
+    
+    template = agent.templates[platform]
+    
+    # A vaga no LLM é reservada antes de abrir o stream (429/503 ainda como JSON)
+    # e liberada quando a resposta termina ou o cliente desconecta
+    release = admission.hold('llm', priority=PRIORITY_ANIMATED)
+    
+    def events():
+        # O template vai primeiro para o front-end montar o preview parcial
+        yield sse_event('start', {'platform': platform, 'template': template})
         
+        try:
+            yield from stream_events()
+        except LLMSetupError as e:
+            # Resposta já começou: o erro de configuração vai como evento
+            print(f"❌ {e}")
+            yield sse_event('error', {'success': False, 'error': str(e)})
+    
+    def stream_events():
+        for kind, text in agent.stream_post_content(prompt, platform, regenerate):
+            if kind != 'final':
+                yield sse_event(kind, {'delta': text})
+                continue
+            
+            # Armazenar HTML final
+            html_content = template.replace("{CONTENT}", text)
+            content_id = str(uuid.uuid4())
+            meta = post_meta(platform)
+            html_storage.set(content_id, html_content, meta)
+            
+            yield sse_event('done', {
+                'success': True,
+                'html': html_content,
+                'content_id': content_id,
+                'meta': meta,
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    response = Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(release)
+    return response
+
+@app.route('/download', methods=['GET', 'POST'])
+async def download_file():
+    """Download do artefato (GET com content_id permite <video src> com seek via Range)"""
+    data = request.get_json() if request.method == 'POST' else request.args.to_dict()
+    
+    try:
+        # Storage em SQLite/Redis: lido fora do loop compartilhado
+        html_content, format, options = await asyncio.to_thread(read_render_request, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        file_bytes, mimetype, filename = await render_artifact(html_content, format, options)
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"Erro no download: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e), 'details': traceback.format_exc()}), 500
+    
+    return send_artifact(
+        file_bytes, mimetype, filename, artifact_etag(html_content, format, options),
+        as_attachment=not flag(data.get('inline'))
+    )
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Enfileira uma renderização e retorna imediatamente o ID do job"""
+    data = request.get_json()
+    
+    try:
+        html_content, format, options = read_render_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    kind = 'video' if format == 'mp4' else 'image'
+    # QueueFull vira 429 com Retry-After (admission_rejected)
+    job = render_jobs.submit(
+        kind,
+        lambda report_progress: render_artifact(html_content, format, options, report_progress),
+        format
+    )
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status_url': f'/jobs/{job.id}',
+        'events_url': f'/jobs/{job.id}/events',
+        'result_url': f'/jobs/{job.id}/result'
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status e progresso de um job"""
+    job = render_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Progresso do job via Server-Sent Events"""
+    job = render_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return Response(
+        stream_with_context(job.sse_events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Artefato final de um job concluído"""
+    job = render_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'error':
+        return jsonify({'error': job.error}), 500
+    if job.status != 'done':
+        return jsonify({'error': 'Job not finished', 'status': job.to_dict()}), 409
+    
+    # O resultado de um job não muda: o ID serve de ETag
+    return send_artifact(job.result, job.mimetype, job.filename, job.id)
+
+@app.route('/batch', methods=['POST'])
+async def batch_export():
+    """Exporta várias plataformas x formatos a partir de um único prompt"""
+    data = request.get_json()
+    prompt = data.get('prompt', '')
+    platforms = data.get('platforms') or list(agent.templates)
+    formats = [f.lower() for f in data.get('formats') or ['png', 'jpg', 'gif']]
+    output = data.get('output', 'zip')
+    
+    if not prompt:
+        return jsonify({'error': 'Prompt é obrigatório'}), 400
+    
+    invalid = [p for p in platforms if p not in agent.templates]
+    if invalid:
+        return jsonify({'error': f'Plataformas inválidas: {", ".join(invalid)}'}), 400
+    
+    invalid = [f for f in formats if f not in DOWNLOAD_FORMATS]
+    if invalid:
+        return jsonify({'error': f'Invalid format. Use: {", ".join(DOWNLOAD_FORMATS)}'}), 400
+    
+    if output not in ('zip', 'manifest'):
+        return jsonify({'error': 'output deve ser "zip" ou "manifest"'}), 400
+    
+    sizes = data.get('sizes') or ['standard']
+    invalid = [size for size in sizes if size not in OUTPUT_SIZES]
+    if invalid:
+        return jsonify({'error': f'Invalid size. Use: {", ".join(OUTPUT_SIZES)}'}), 400
+    
+    options = {key: data.get(key) for key in ('duration', 'frames', 'fps', 'crf', 'bitrate', 'faststart')}
+    
+    async def render(report_progress=None):
+        # Lotes cedem a vez para exportações interativas
+        with admission_policy(priority=PRIORITY_BATCH):
+            return await render_batch(
+                prompt, platforms, formats, options, output, report_progress, bool(data.get('regenerate')),
+                sizes
+            )
+    
+    if data.get('async'):
+        job = render_jobs.submit('batch', render, output)
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events',
+            'result_url': f'/jobs/{job.id}/result'
+        }), 202
+    
+    try:
+        file_bytes, mimetype, filename = await render()
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        print(f"Erro no lote: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    if output == 'manifest':
+        return Response(file_bytes, mimetype=mimetype)
+    # Cada lote é gerado de novo: ETag única, só para o Range do download
+    return send_artifact(file_bytes, mimetype, filename, uuid.uuid4().hex)
 
 # Manter rota antiga para compatibilidade
 @app.route('/download/<format>')
@@ -683,7 +1300,7 @@ def download_image_legacy(format):
     }), 400
 
 @app.route('/test-conversion')
-def test_conversion():
+async def test_conversion():
     """Rota para testar conversões"""
     test_html = """
     <!DOCTYPE html>
@@ -711,17 +1328,17 @@ def test_conversion():
     """
     
     results = {}
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    formats = ['png', 'jpg', 'gif']
     
-    for format in ['png', 'jpg', 'gif']:
-        try:
-            file_bytes = loop.run_until_complete(agent.html_to_image(test_html, format))
-            results[format] = f"✅ Success - {len(file_bytes)} bytes"
-        except Exception as e:
-            results[format] = f"❌ Error: {str(e)}"
-    
-    loop.close()
+    # As conversões rodam em paralelo no mesmo loop/pool de browsers
+    outputs = await asyncio.gather(
+        *(agent.html_to_image(test_html, format) for format in formats), return_exceptions=True
+    )
+    for format, output in zip(formats, outputs):
+        if isinstance(output, Exception):
+            results[format] = f"❌ Error: {str(output)}"
+        else:
+            results[format] = f"✅ Success - {len(output)} bytes"
     
     return jsonify({
         'status': 'Test complete',
@@ -729,6 +1346,73 @@ def test_conversion():
         'playwright_available': PLAYWRIGHT_AVAILABLE
     })
 
+def readiness():
+    """(pronto, detalhes): algum engine aquecido e, com workers, todos vivos"""
+    details = {'warmup': agent.warmup.stats()}
+    ready = agent.warmup.ready
+    if agent.render_workers:
+        workers = agent.render_workers.stats()
+        details['render_workers'] = {key: workers[key] for key in ('workers', 'alive', 'healthy')}
+        ready = ready and workers['healthy']
+    return ready, details
+
+@app.route('/livez')
+def livez():
+    """Liveness: o processo responde (não depende de browser nem do LLM)"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: só aceita tráfego depois que um engine renderizou (com PREWARM=1)"""
+    ready, details = readiness()
+    return jsonify({'status': 'ready' if ready else 'warming', **details}), 200 if ready else 503
+
+@app.route('/health')
+async def health():
+    """Health check do pool de browsers"""
+    stats = {
+        'render_cache': agent.render_cache.stats(),
+        # SQLite (COUNT/SUM) ou Redis: fora do loop compartilhado
+        'html_storage': await asyncio.to_thread(html_storage.stats),
+        'jobs': render_jobs.stats(),
+        'llm_cache': llm_cache.stats(),
+        'llm': llm.stats(),
+        'admission': admission.stats(),
+        'engines': agent.engine_router.stats(),
+        'warmup': agent.warmup.stats(),
+        'coalescing': {'render': agent.render_flights.stats(), 'llm': agent.llm_flights.stats()}
+    }
+    
+    if agent.render_workers:
+        # Os browsers vivem nos processos de renderização
+        workers = agent.render_workers.stats()
+        return jsonify({
+            'status': 'ok' if workers['healthy'] else 'unhealthy',
+            'playwright_available': PLAYWRIGHT_AVAILABLE,
+            'render_workers': workers,
+            **stats
+        }), 200 if workers['healthy'] else 503
+    
+    if not agent.playwright_pool:
+        return jsonify({
+            'status': 'degraded',
+            'playwright_available': False,
+            **stats
+        })
+    
+    pool = await agent.playwright_pool.health_check()
+    return jsonify({
+        'status': 'ok' if pool['healthy'] else 'unhealthy',
+        'playwright_available': True,
+        'playwright_pool': pool,
+        **stats
+    }), 200 if pool['healthy'] else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas no formato do Prometheus (latência por etapa, engines, fallbacks e caches)"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/preview', methods=['POST'])
 def preview():
     """Preview do HTML renderizado"""
@@ -736,19 +1420,63 @@ def preview():
     html_content = data.get('html', '')
     content_id = data.get('content_id', '')
     
-    if content_id and content_id in html_storage:
-        html_content = html_storage[content_id]
+    html_content = html_storage.get(content_id) or html_content
     
     if not html_content:
         return "No content to preview", 400
     
     return html_content
 
+@app.route('/preview-image', methods=['GET', 'POST'])
+async def preview_image():
+    """Preview renderizado no servidor (igual à exportação): imagem reduzida dentro do prazo e,
+    em background, a versão completa (X-Upgrade-Job / X-Upgrade-Url / X-Upgrade-Events)"""
+    data = request.get_json() if request.method == 'POST' else request.args.to_dict()
+    html_content, meta = await asyncio.to_thread(html_storage.get_post, data.get('content_id', ''))
+    html_content = html_content or data.get('html', '')
+    if not html_content:
+        return jsonify({'error': 'HTML content is required'}), 400
+    html_content = with_platform(html_content, meta.get('platform') or data.get('platform'))
+    
+    try:
+        scale, format = resolve_preview(data.get('scale'), data.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        file_bytes = await asyncio.wait_for(
+            agent.html_to_image(html_content, format, preview_scale=scale), PREVIEW_BUDGET
+        )
+    except asyncio.TimeoutError:
+        # O front-end continua com o preview em HTML
+        return jsonify({'error': f'Preview não ficou pronto em {PREVIEW_BUDGET:.1f}s', 'fallback': 'html'}), 504
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        print(f"Erro no preview: {e}")
+        return jsonify({'error': str(e), 'fallback': 'html'}), 500
+    
+    mimetype, file_ext = MIMETYPES[format]
+    etag = artifact_etag(html_content, format, {'preview_scale': scale})
+    response = send_artifact(file_bytes, mimetype, f'preview.{file_ext}', etag, as_attachment=False)
+    
+    if flag(data.get('upgrade', True)):
+        async def upgrade(report_progress):
+            # A versão completa cede a vez para exportações pedidas pelo usuário
+            with admission_policy(priority=PRIORITY_BATCH):
+                return await render_artifact(html_content, PREVIEW_UPGRADE_FORMAT, {}, report_progress)
+        try:
+            job = render_jobs.submit('image', upgrade, PREVIEW_UPGRADE_FORMAT)
+        except QueueFull:
+            return response
+        response.headers['X-Upgrade-Job'] = job.id
+        response.headers['X-Upgrade-Url'] = f'/jobs/{job.id}/result'
+        response.headers['X-Upgrade-Events'] = f'/jobs/{job.id}/events'
+    return response
+
 @app.route('/cleanup-storage')
 def cleanup_storage():
     """Limpar armazenamento temporário (útil para manutenção)"""
-    count = len(html_storage)
-    html_storage.clear()
+    count = html_storage.clear()
     return jsonify({
         'status': 'success',
         'message': f'Cleared {count} items from storage'
@@ -758,5 +1486,5 @@ if __name__ == '__main__':
     print("🚀 Iniciando servidor...")
     print(f"📦 Playwright disponível: {PLAYWRIGHT_AVAILABLE}")
     print("🔧 Selenium configurado como fallback")
-    print("✨ Formatos suportados: PNG, JPG, JPEG, GIF, MP4")
+    print("✨ Formatos suportados: PNG, JPG, JPEG, WebP, AVIF, GIF, MP4")
     app.run(debug=True, port=5010)
\ No newline at end of file
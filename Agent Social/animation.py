@@ -0,0 +1,52 @@
+import os
+
+from browser_pool import SETTLE_MS
+
+# Configuração padrão de captura de frames (sobrescrevível por request)
+GIF_FRAMES = int(os.getenv('GIF_FRAMES', 10))
+GIF_FPS = float(os.getenv('GIF_FPS', 10 / 3))  # ~300ms entre frames
+
+# Pausa todas as animações CSS/Web Animations da página (o relógio deixa de andar)
+PAUSE_ANIMATIONS_JS = """
+() => {
+    const animations = document.getAnimations();
+    animations.forEach(a => a.pause());
+    return animations.length;
+}
+"""
+
+# Posiciona todas as animações no instante t (ms) e espera o frame ser pintado
+SEEK_ANIMATIONS_JS = """
+(t) => {
+    document.getAnimations().forEach(a => { a.pause(); a.currentTime = t; });
+    return new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(() => resolve(true))));
+}
+"""
+
+# Versões para execute_async_script do Selenium (callback como último argumento)
+PAUSE_ANIMATIONS_SELENIUM_JS = """
+const done = arguments[arguments.length - 1];
+done((""" + PAUSE_ANIMATIONS_JS + """)());
+"""
+
+SEEK_ANIMATIONS_SELENIUM_JS = """
+const done = arguments[arguments.length - 1];
+(""" + SEEK_ANIMATIONS_JS + """)(arguments[0]).then(done);
+"""
+
+
+def resolve_capture(frames=None, fps=None):
+    """Normaliza (frames, fps) aplicando os padrões e limites seguros"""
+    frames = max(1, min(int(frames or GIF_FRAMES), 120))
+    fps = max(0.5, min(float(fps or GIF_FPS), 60.0))
+    return frames, fps
+
+
+def frame_duration_ms(fps):
+    return int(round(1000 / fps))
+
+
+def frame_times(frames, fps, start_ms=SETTLE_MS):
+    """Instantes (ms no relógio das animações) de cada frame, a partir do fim da entrada"""
+    step = 1000 / fps
+    return [start_ms + i * step for i in range(frames)]
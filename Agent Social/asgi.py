@@ -0,0 +1,9 @@
+"""Entrada ASGI: uvicorn asgi:application --workers 1
+
+As views async já rodam no loop compartilhado do processo (runtime.background_loop);
+o adaptador traduz o protocolo ASGI e atende cada request numa thread de um pool de
+ASGI_THREADS (um SSE ou render longo não bloqueia os demais requests)."""
+from agent import app
+from runtime import wsgi_to_asgi
+
+application = wsgi_to_asgi(app)
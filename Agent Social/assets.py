@@ -0,0 +1,162 @@
+import base64
+import json
+import os
+import re
+from urllib.parse import urljoin
+
+VENDOR_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'vendor')
+MANIFEST_FILE = 'manifest.json'
+
+# URLs externas usadas pelos templates (o build_assets.py baixa todas)
+TAILWIND_CDN_URL = 'https://cdn.tailwindcss.com'
+TAILWIND_BUNDLE_URL = 'https://cdn.tailwindcss.com/__bundle__/tailwind.css'
+TEMPLATE_ASSET_URLS = [
+    'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&display=swap',
+    'https://fonts.googleapis.com/css2?family=Source+Sans+Pro:wght@400;600;700&display=swap',
+    'https://fonts.googleapis.com/css2?family=Twitter+Chirp:wght@400;700&display=swap',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+]
+
+# O script do Tailwind Play CDN é trocado por um stylesheet pré-compilado (render-blocking)
+TAILWIND_SHIM_JS = f'document.write(\'<link rel="stylesheet" href="{TAILWIND_BUNDLE_URL}">\');'
+
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+SCRIPT_TAG_RE = re.compile(r'<script[^>]*\ssrc=["\'](https?://[^"\']+)["\'][^>]*>\s*</script>', re.IGNORECASE)
+LINK_TAG_RE = re.compile(r'<link[^>]*\shref=["\'](https?://[^"\']+)["\'][^>]*>', re.IGNORECASE)
+
+
+def normalize_url(url):
+    """Normaliza a URL para lookup (a raiz de um host vem com ou sem barra final)"""
+    return url.rstrip('/')
+
+
+class AssetBundleMissing(RuntimeError):
+    """RENDER_OFFLINE=1 sem bundle completo: o render dependeria da rede que foi bloqueada"""
+
+
+class AssetBundle:
+    """Assets vendorizados (Tailwind pré-compilado, fontes, Font Awesome) servidos da memória"""
+
+    def __init__(self, vendor_dir=VENDOR_DIR, offline=None):
+        self.vendor_dir = vendor_dir
+        self.offline = offline if offline is not None else os.getenv('RENDER_OFFLINE', '0') == '1'
+        self._assets = {}
+        self._inlined = {}
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        manifest_path = os.path.join(self.vendor_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            if self.offline:
+                raise AssetBundleMissing(
+                    f"RENDER_OFFLINE=1 mas o bundle de assets não existe em {self.vendor_dir}. Rode build_assets.py"
+                )
+            return
+
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        for url, entry in manifest.get('assets', {}).items():
+            with open(os.path.join(self.vendor_dir, entry['file']), 'rb') as f:
+                self._assets[normalize_url(url)] = (f.read(), entry['content_type'])
+
+        tailwind = manifest.get('tailwind')
+        if self.offline and not tailwind:
+            raise AssetBundleMissing("RENDER_OFFLINE=1 mas o bundle não tem o Tailwind compilado. Rode build_assets.py")
+        if tailwind:
+            with open(os.path.join(self.vendor_dir, tailwind), 'rb') as f:
+                self._assets[normalize_url(TAILWIND_BUNDLE_URL)] = (f.read(), 'text/css')
+            self._assets[normalize_url(TAILWIND_CDN_URL)] = (TAILWIND_SHIM_JS.encode('utf-8'), 'application/javascript')
+
+        print(f"📦 Bundle de assets carregado: {len(self._assets)} arquivos")
+
+    @property
+    def available(self):
+        return bool(self._assets)
+
+    @property
+    def wait_until(self):
+        """Sem rede no caminho crítico não há por que esperar networkidle"""
+        return 'load' if self.available else 'networkidle'
+
+    def lookup(self, url):
+        """Retorna (bytes, content_type) para uma URL vendorizada, ou None"""
+        asset = self._assets.get(normalize_url(url))
+        if asset is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return asset
+
+    async def handle_route(self, route):
+        """Handler de interceptação do Playwright: serve do cache em memória"""
+        url = route.request.url
+        if url.startswith(('data:', 'about:', 'blob:')):
+            return await route.continue_()
+
+        asset = self.lookup(url)
+        if asset is not None:
+            body, content_type = asset
+            return await route.fulfill(
+                status=200,
+                body=body,
+                content_type=content_type,
+                headers={'Access-Control-Allow-Origin': '*'}
+            )
+
+        if self.offline:
+            return await route.abort()
+        return await route.continue_()
+
+    def _inline_css(self, url):
+        """CSS do bundle com url(...) resolvidas como data URIs"""
+        if url in self._inlined:
+            return self._inlined[url]
+
+        css = self._assets[normalize_url(url)][0].decode('utf-8')
+
+        def replace(match):
+            ref = urljoin(url, match.group(2))
+            asset = self.lookup(ref)
+            if asset is None:
+                return match.group(0)
+            body, content_type = asset
+            return f'url(data:{content_type};base64,{base64.b64encode(body).decode("ascii")})'
+
+        inlined = CSS_URL_RE.sub(replace, css)
+        self._inlined[url] = inlined
+        return inlined
+
+    def inline(self, html_content):
+        """Embute os assets do bundle no HTML (para engines sem interceptação de requests)"""
+        if not self.available:
+            return html_content
+
+        def replace_script(match):
+            url = match.group(1)
+            if normalize_url(url) == normalize_url(TAILWIND_CDN_URL) and self.lookup(TAILWIND_BUNDLE_URL):
+                return f'<style>{self._inline_css(TAILWIND_BUNDLE_URL)}</style>'
+            if self.lookup(url) is not None:
+                return f'<script>{self._assets[normalize_url(url)][0].decode("utf-8")}</script>'
+            return '' if self.offline else match.group(0)
+
+        def replace_link(match):
+            url = match.group(1)
+            asset = self.lookup(url)
+            if asset is not None and asset[1] == 'text/css':
+                return f'<style>{self._inline_css(url)}</style>'
+            return '' if self.offline else match.group(0)
+
+        html_content = SCRIPT_TAG_RE.sub(replace_script, html_content)
+        return LINK_TAG_RE.sub(replace_link, html_content)
+
+    def stats(self):
+        return {
+            'available': self.available,
+            'offline': self.offline,
+            'assets': len(self._assets),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
@@ -0,0 +1 @@
+"""Benchmarks offline: LLM local (stub_llm) e medição de latência/throughput/memória (run)"""
@@ -0,0 +1,479 @@
+"""Benchmark de latência (fria e quente), throughput e memória por formato e engine.
+
+Roda o app no próprio processo (ou contra um servidor com --url) usando o LLM local
+de bench/stub_llm.py, e grava os resultados em JSON para comparar entre versões:
+
+    cd "Agent Social"
+    python -m bench.run --formats png,jpg,gif,mp4 --engines playwright,selenium \\
+        --requests 20 --concurrency 4 --output bench-results.json
+
+    # Falha (exit 1) se alguma mediana piorar mais de 20% em relação à base
+    python -m bench.run --output atual.json --compare bench-results.json --max-regression 0.2
+
+    # Também mede processos novos até a primeira renderização, com e sem PREWARM
+    python -m bench.run --formats png --startup
+"""
+import argparse
+import json
+import os
+import platform as host_platform
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.stub_llm import PLATFORMS, start_stub_server
+
+FORMATS = ('png', 'jpg', 'gif', 'mp4')
+ENGINES = ('playwright', 'selenium')
+
+PROMPTS = {
+    'instagram': 'Lançamento de assinatura de café especial',
+    'linkedin': 'Estudo sobre produtividade de times híbridos',
+    'twitter': 'Boas práticas de deploy com feature flags',
+}
+
+STAGE_LINE = re.compile(r'^agent_stage_seconds_(sum|count)\{stage="([^"]*)"[^}]*\} (\S+)$')
+
+
+def rss_bytes(pid=None):
+    """RSS do processo e de todos os filhos (workers de renderização, Chromium, ffmpeg)"""
+    pid = pid or os.getpid()
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+    except (OSError, StopIteration):
+        if pid != os.getpid():
+            return 0
+        # Sem /proc: pico do próprio processo (ru_maxrss em KB no Linux)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return rss + sum(rss_bytes(child) for child in children)
+
+
+class MemorySampler:
+    """Amostra o RSS em background para registrar o pico durante um cenário"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_rss = self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_rss = rss_bytes()
+        self.peak = max(self.peak, self.end_rss)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = (len(values) - 1) * p
+    low = int(index)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (index - low)
+
+
+def parse_stage_totals(text):
+    """{etapa: [soma, contagem]} a partir do /metrics (somando plataformas/formatos/engines)"""
+    totals = {}
+    for line in text.splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            entry = totals.setdefault(stage, [0.0, 0])
+            entry[0 if kind == 'sum' else 1] += float(value)
+    return totals
+
+
+class InProcessTarget:
+    """App importado neste processo; permite trocar de engine e derrubar os browsers (latência fria)"""
+
+    name = 'in-process'
+
+    def __init__(self):
+        import agent
+        self.module = agent
+        self.router = agent.agent.engine_router
+        self.engine_order = list(self.router.order)
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self.module.app.test_client()
+        return self._local.client
+
+    def request(self, method, path, payload=None):
+        response = self._client().open(path, method=method, json=payload)
+        try:
+            return response.status_code, response.get_data()
+        finally:
+            response.close()
+
+    def use_engine(self, engine):
+        """Força o engine no roteador; retorna o motivo quando não é possível neste ambiente"""
+        if engine not in self.engine_order:
+            return f'{engine} não disponível'
+        self.router.order = [engine]
+        return None
+
+    def supports(self, engine, format):
+        if format == 'mp4':
+            if engine != 'playwright':
+                return 'MP4 requer Playwright'
+            if not self.module.ffmpeg_available():
+                return 'ffmpeg indisponível'
+        return None
+
+    def reset_browsers(self):
+        """Fecha browsers e drivers para a próxima renderização pagar o lançamento"""
+        from runtime import run_async
+        agent = self.module.agent
+        if agent.playwright_pool:
+            run_async(agent.playwright_pool.close())
+        agent.selenium_pool.close()
+        return agent.render_workers is None
+
+    def close(self):
+        self.router.order = self.engine_order
+
+
+class HttpTarget:
+    """Servidor já em execução (que deve usar o LLM local via DEEPSEEK_BASE_URL)"""
+
+    name = 'http'
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        req = urllib.request.Request(
+            self.url + path, data=data, method=method, headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=600) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def use_engine(self, engine):
+        return None if engine == 'server' else 'engine definido pelo servidor (use --engines server)'
+
+    def supports(self, engine, format):
+        return None
+
+    def reset_browsers(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def stage_totals(target):
+    try:
+        status, body = target.request('GET', '/metrics')
+    except Exception:
+        return {}
+    return parse_stage_totals(body.decode('utf-8')) if status == 200 else {}
+
+
+def run_scenario(target, name, make_payload, path, args, cold=False, **info):
+    """Executa o cenário: (opcionalmente) um request frio e depois N requests com concorrência C"""
+    print(f"⏱️  {name}...")
+    stages_before = stage_totals(target)
+
+    def call(i):
+        started = time.perf_counter()
+        try:
+            status, body = target.request('POST', path, make_payload(i))
+        except Exception as e:
+            return False, time.perf_counter() - started, 0, str(e)
+        ok = status == 200
+        error = None if ok else f'HTTP {status}: {body[:200].decode("utf-8", "replace")}'
+        return ok, time.perf_counter() - started, len(body), error
+
+    result = {'name': name, 'requests': args.requests, 'concurrency': args.concurrency, **info}
+    with MemorySampler() as memory:
+        if cold:
+            ok, seconds, _, error = call(-1)
+            result['cold_ms'] = round(seconds * 1000, 1) if ok else None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            outcomes = list(pool.map(call, range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [seconds * 1000 for ok, seconds, _, _ in outcomes if ok]
+    sizes = [size for ok, _, size, _ in outcomes if ok]
+    errors = [error for ok, _, _, error in outcomes if not ok]
+
+    stages_after = stage_totals(target)
+    stages = {}
+    for stage, (total, count) in stages_after.items():
+        before_total, before_count = stages_before.get(stage, (0.0, 0))
+        if count > before_count:
+            stages[stage] = {
+                'count': int(count - before_count),
+                'mean_ms': round((total - before_total) / (count - before_count) * 1000, 1)
+            }
+
+    result.update({
+        'errors': len(errors),
+        'error_sample': errors[:3],
+        'latency_ms': {
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'min': min(latencies, default=None),
+            'max': max(latencies, default=None),
+        },
+        'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed else None,
+        'bytes_mean': round(sum(sizes) / len(sizes)) if sizes else None,
+        'rss_start_mb': round(memory.start_rss / 2 ** 20, 1),
+        'rss_peak_mb': round(memory.peak / 2 ** 20, 1),
+        'rss_end_mb': round(memory.end_rss / 2 ** 20, 1),
+        'stages': stages,
+    })
+    for key, value in result['latency_ms'].items():
+        if value is not None:
+            result['latency_ms'][key] = round(value, 1)
+
+    p50 = result['latency_ms']['p50']
+    print(f"   p50={p50}ms p95={result['latency_ms']['p95']}ms "
+          f"{result['throughput_rps']} req/s pico={result['rss_peak_mb']}MB erros={len(errors)}")
+    return result
+
+
+def measure_startup(args, llm_url, format):
+    """Processos novos (bench/startup.py) com PREWARM desligado e ligado"""
+    results = []
+    for prewarm in ('0', '1'):
+        name = f'startup:{format}:prewarm={prewarm}'
+        print(f"⏱️  {name}...")
+        env = {
+            **os.environ,
+            'PREWARM': prewarm,
+            'RENDER_WORKERS': str(args.workers),
+            'DEEPSEEK_BASE_URL': llm_url,
+        }
+        completed = subprocess.run(
+            [sys.executable, '-m', 'bench.startup', '--format', format],
+            capture_output=True, text=True, env=env, timeout=600,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        # O app também escreve no stdout: o resultado é a última linha JSON
+        lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+        if completed.returncode != 0 or not lines:
+            print(f"❌ {name} falhou: {completed.stderr.strip()[-300:]}")
+            results.append({'name': name, 'skipped': 'processo falhou'})
+            continue
+        result = {'name': name, **json.loads(lines[-1])}
+        print(f"   import={result['import_ms']}ms pronto={result['ready_ms'] or '-'}ms "
+              f"primeiro request={result['first_request_ms']}ms total={result['first_render_ms'] or '-'}ms")
+        results.append(result)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """Compara cenário a cenário com a base; retorna a lista de regressões"""
+    previous = {scenario['name']: scenario for scenario in baseline.get('scenarios', [])}
+    regressions = []
+    print(f"\n📊 Comparação com {baseline.get('meta', {}).get('revision') or 'base'}:")
+    for scenario in results['scenarios']:
+        base = previous.get(scenario['name'])
+        if not base or scenario.get('skipped') or base.get('skipped'):
+            continue
+        checks = [
+            ('p50', scenario['latency_ms']['p50'], base['latency_ms']['p50'], True),
+            ('p95', scenario['latency_ms']['p95'], base['latency_ms']['p95'], True),
+            ('cold', scenario.get('cold_ms'), base.get('cold_ms'), True),
+            ('req/s', scenario['throughput_rps'], base['throughput_rps'], False),
+            ('pico MB', scenario['rss_peak_mb'], base['rss_peak_mb'], True),
+        ]
+        for label, current, before, lower_is_better in checks:
+            if not current or not before:
+                continue
+            change = (current - before) / before
+            worse = change > max_regression if lower_is_better else change < -max_regression
+            marker = '❌' if worse else '  '
+            print(f"{marker} {scenario['name']:<28} {label:<8} {before:>10} -> {current:<10} ({change:+.1%})")
+            if worse:
+                regressions.append(f"{scenario['name']} {label} {change:+.1%}")
+        if scenario['errors'] > base['errors']:
+            regressions.append(f"{scenario['name']} erros {base['errors']} -> {scenario['errors']}")
+
+    previous = {startup['name']: startup for startup in baseline.get('startup', [])}
+    for startup in results.get('startup', []):
+        base = previous.get(startup['name'])
+        if not base or startup.get('skipped') or base.get('skipped'):
+            continue
+        for label in ('import_ms', 'first_request_ms', 'first_render_ms'):
+            current, before = startup.get(label), base.get(label)
+            if not current or not before:
+                continue
+            change = (current - before) / before
+            worse = change > max_regression
+            marker = '❌' if worse else '  '
+            print(f"{marker} {startup['name']:<28} {label:<8} {before:>10} -> {current:<10} ({change:+.1%})")
+            if worse:
+                regressions.append(f"{startup['name']} {label} {change:+.1%}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline do Agent Social')
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--engines', default='playwright', help='playwright, selenium (ou server com --url)')
+    parser.add_argument('--platforms', default=','.join(PLATFORMS))
+    parser.add_argument('--requests', type=int, default=10, help='requests quentes por cenário')
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=0, help='RENDER_WORKERS no modo local')
+    parser.add_argument('--video-duration', type=float, default=2, help='segundos de cada MP4')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='latência do LLM local (s)')
+    parser.add_argument('--llm-jitter', type=float, default=0.0)
+    parser.add_argument('--llm-port', type=int, default=0, help='porta do LLM local (fixe-a com --url)')
+    parser.add_argument('--startup', action='store_true',
+                        help='mede processos novos até a primeira renderização (com e sem PREWARM)')
+    parser.add_argument('--url', help='servidor em execução em vez do app local')
+    parser.add_argument('--output', help='arquivo JSON de resultados')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para detectar regressões')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='piora tolerada (0.2 = 20%%)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    formats = [f.strip().lower() for f in args.formats.split(',') if f.strip()]
+    engines = [e.strip().lower() for e in args.engines.split(',') if e.strip()]
+    platforms = [p.strip().lower() for p in args.platforms.split(',') if p.strip()]
+
+    stub, llm_url = start_stub_server(args.llm_port, args.llm_latency, args.llm_jitter)
+    print(f"🤖 LLM local em {llm_url} (latência {args.llm_latency}s)")
+
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        # Antes de importar o app: sem caches (cada request renderiza de verdade) e LLM local
+        os.environ['DEEPSEEK_BASE_URL'] = llm_url
+        os.environ.setdefault('DEEPSEEK_API_KEY', 'bench')
+        os.environ['LLM_CACHE_ENABLED'] = '0'
+        os.environ['RENDER_CACHE_MEMORY_MB'] = '0'
+        os.environ['RENDER_CACHE_DISK_MB'] = '0'
+        os.environ['RENDER_WORKERS'] = str(args.workers)
+        target = InProcessTarget()
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': sys.version.split()[0],
+            'host': host_platform.platform(),
+            'cpus': os.cpu_count(),
+            'target': target.name,
+            'args': vars(args),
+        },
+        'scenarios': [],
+    }
+
+    # 1. Geração (LLM local + app): também fornece o HTML usado nas renderizações
+    htmls = {}
+    for platform in platforms:
+        status, body = target.request(
+            'POST', '/generate', {'prompt': PROMPTS.get(platform, 'Post de teste'), 'platform': platform}
+        )
+        if status != 200:
+            print(f"❌ /generate falhou para {platform}: HTTP {status}")
+            return 2
+        htmls[platform] = json.loads(body)['html']
+
+    results['scenarios'].append(run_scenario(
+        target, 'generate', lambda i: {
+            'prompt': f"{PROMPTS.get(platforms[i % len(platforms)], 'Post')} #{uuid.uuid4().hex[:6]}",
+            'platform': platforms[i % len(platforms)]
+        }, '/generate', args, kind='generate'
+    ))
+
+    # 2. Renderização por engine x formato, alternando as plataformas
+    def render_payload(format):
+        def payload(i):
+            platform = platforms[i % len(platforms)]
+            # Comentário único: nenhum cache (local ou do servidor) serve o resultado
+            html = htmls[platform] + f'<!-- bench {uuid.uuid4().hex} -->'
+            return {'html': html, 'format': format, 'duration': args.video_duration}
+        return payload
+
+    for engine in engines:
+        reason = target.use_engine(engine)
+        for format in formats:
+            name = f'render:{engine}:{format}'
+            skipped = reason or target.supports(engine, format)
+            if skipped:
+                print(f"⏭️  {name}: {skipped}")
+                results['scenarios'].append({'name': name, 'engine': engine, 'format': format, 'skipped': skipped})
+                continue
+            # Latência fria: browsers fechados antes do primeiro request do cenário
+            cold = target.reset_browsers()
+            results['scenarios'].append(run_scenario(
+                target, name, render_payload(format), '/download', args, cold=cold,
+                kind='render', engine=engine, format=format
+            ))
+
+    target.close()
+    if args.startup and not args.url:
+        results['startup'] = measure_startup(args, llm_url, formats[0] if formats else 'png')
+    results['meta']['llm_requests'] = stub.requests
+    stub.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressão(ões): " + '; '.join(regressions))
+            return 1
+        print("\n✅ Sem regressões")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
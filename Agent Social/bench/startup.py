@@ -0,0 +1,72 @@
+"""Tempo até a primeira renderização bem-sucedida de um processo novo.
+
+Mede, num processo recém-iniciado: o import do app, o tempo até o /readyz responder 200
+e a primeira renderização. Imprime uma linha JSON (o bench.run usa com --startup):
+
+    cd "Agent Social"
+    PREWARM=1 python -m bench.startup --format png --platform instagram
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+HEAVY_MODULES = ('selenium', 'playwright', 'PIL', 'numpy', 'openai', 'httpx', 'httpx2')
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def measure(format, platform, ready_timeout):
+    started = time.perf_counter()
+    import agent
+    imported = time.perf_counter()
+    heavy = sorted(name for name in HEAVY_MODULES if name in sys.modules)
+
+    client = agent.app.test_client()
+    ready_ms = None
+    while time.perf_counter() - imported < ready_timeout:
+        if client.get('/readyz').status_code == 200:
+            ready_ms = round((time.perf_counter() - started) * 1000, 1)
+            break
+        time.sleep(0.05)
+
+    with open(os.path.join(FIXTURES, f'{platform}.html'), encoding='utf-8') as f:
+        html = f.read()
+    request_started = time.perf_counter()
+    response = client.post('/download', json={'html': html, 'format': format, 'platform': platform})
+    finished = time.perf_counter()
+
+    return {
+        'prewarm': agent.agent.warmup.enabled,
+        'format': format,
+        'platform': platform,
+        'status': response.status_code,
+        'import_ms': round((imported - started) * 1000, 1),
+        'heavy_modules_on_import': heavy,
+        'ready_ms': ready_ms,
+        # Latência que o primeiro usuário vê (o tráfego só chega depois do readiness)
+        'first_request_ms': round((finished - request_started) * 1000, 1),
+        # Do início do processo até o primeiro artefato
+        'first_render_ms': round((finished - started) * 1000, 1) if response.status_code == 200 else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tempo até a primeira renderização de um processo novo')
+    parser.add_argument('--format', default='png')
+    parser.add_argument('--platform', default='instagram')
+    parser.add_argument('--ready-timeout', type=float, default=120)
+    args = parser.parse_args(argv)
+
+    # Sem caches: a primeira renderização precisa de fato abrir o browser
+    os.environ['LLM_CACHE_ENABLED'] = '0'
+    os.environ['RENDER_CACHE_MEMORY_MB'] = '0'
+    os.environ['RENDER_CACHE_DISK_MB'] = '0'
+    os.environ.setdefault('DEEPSEEK_API_KEY', 'bench')
+
+    print(json.dumps(measure(args.format, args.platform, args.ready_timeout)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
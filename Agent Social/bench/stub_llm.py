@@ -0,0 +1,185 @@
+"""Servidor local compatível com a API da OpenAI/DeepSeek para benchmarks offline.
+
+Responde /chat/completions (normal e stream=True) com os posts de bench/fixtures,
+escolhidos pela plataforma citada no prompt, após uma latência configurável.
+
+Uso isolado:
+    python -m bench.stub_llm --port 8765 --latency 1.5
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765 python agent.py
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PLATFORMS = ('instagram', 'linkedin', 'twitter')
+
+REASONING = "Analisando a plataforma, o público e a paleta do template antes de montar o layout. "
+
+
+def load_fixtures():
+    fixtures = {}
+    for platform in PLATFORMS:
+        with open(os.path.join(FIXTURES_DIR, f'{platform}.html'), encoding='utf-8') as f:
+            fixtures[platform] = f.read()
+    return fixtures
+
+
+def detect_platform(messages):
+    """Plataforma citada no prompt de sistema ("Plataforma: linkedin"); instagram por padrão"""
+    text = ' '.join(str(message.get('content', '')) for message in messages)
+    match = re.search(r'Plataforma:\s*(\w+)', text)
+    if match and match.group(1).lower() in PLATFORMS:
+        return match.group(1).lower()
+    for platform in PLATFORMS:
+        if platform in text.lower():
+            return platform
+    return 'instagram'
+
+
+def split_tokens(text, size=24):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'rota desconhecida: {self.path}'}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        server = self.server
+        server.requests += 1
+
+        # Falhas injetadas para exercitar retries e circuit breaker do gateway
+        if server.error_rate and random.random() < server.error_rate:
+            server.errors += 1
+            self._send_json(503, {'error': {'message': 'falha simulada', 'type': 'server_error'}},
+                            {'Retry-After': '0'})
+            return
+
+        time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+
+        content = server.fixtures[detect_platform(request.get('messages', []))]
+        model = request.get('model', 'deepseek-reasoner')
+        usage = {'prompt_tokens': 400, 'completion_tokens': len(content) // 4,
+                 'total_tokens': 400 + len(content) // 4}
+
+        if request.get('stream'):
+            self._stream(model, content, usage, request.get('stream_options') or {})
+            return
+
+        self._send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content, 'reasoning_content': REASONING},
+                'finish_reason': 'stop'
+            }],
+            'usage': usage
+        })
+
+    def _stream(self, model, content, usage, stream_options):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        # Sem Content-Length: o fim da resposta é o fechamento da conexão
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+
+        def chunk(delta=None, finish_reason=None, **extra):
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [] if delta is None else [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                **extra
+            }
+            self.wfile.write(f'data: {json.dumps(payload)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            for piece in split_tokens(REASONING):
+                chunk({'role': 'assistant', 'reasoning_content': piece})
+                time.sleep(self.server.token_delay)
+            for piece in split_tokens(content):
+                chunk({'content': piece})
+                time.sleep(self.server.token_delay)
+            chunk({}, 'stop')
+            if stream_options.get('include_usage'):
+                chunk(usage=usage)
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente cancelou o stream
+            pass
+
+
+def start_stub_server(port=0, latency=1.0, jitter=0.0, token_delay=0.005, error_rate=0.0, verbose=False):
+    """Inicia o servidor numa thread daemon e retorna (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubLLMHandler)
+    server.daemon_threads = True
+    server.fixtures = load_fixtures()
+    server.latency = latency
+    server.jitter = jitter
+    server.token_delay = token_delay
+    server.error_rate = error_rate
+    server.verbose = verbose
+    server.requests = 0
+    server.errors = 0
+    threading.Thread(target=server.serve_forever, name='stub-llm', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM local para benchmarks (compatível com a API da OpenAI)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help='segundos antes do primeiro byte')
+    parser.add_argument('--jitter', type=float, default=0.0, help='variação aleatória da latência (s)')
+    parser.add_argument('--token-delay', type=float, default=0.005, help='intervalo entre chunks no streaming (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 503')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server, url = start_stub_server(
+        args.port, args.latency, args.jitter, args.token_delay, args.error_rate, args.verbose
+    )
+    print(f"🤖 LLM de benchmark em {url} (latência {args.latency}s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
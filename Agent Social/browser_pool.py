@@ -0,0 +1,394 @@
+import asyncio
+import base64
+import os
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from metrics import span
+
+CHROMIUM_ARGS = ['--no-sandbox', '--disable-setuid-sandbox']
+
+# Tempo extra após o carregamento para animações de entrada (compartilhado pelos engines)
+SETTLE_MS = int(os.getenv('RENDER_SETTLE_MS', 2000))
+
+# Limite seguro para navegação via data URL no Chrome (~2MB)
+MAX_DATA_URL = 1_500_000
+
+WAIT_FONTS_PLAYWRIGHT_JS = "() => document.fonts ? document.fonts.ready.then(() => true) : true"
+
+WAIT_FONTS_JS = """
+const done = arguments[arguments.length - 1];
+(document.fonts ? document.fonts.ready : Promise.resolve()).then(() => done(true), () => done(false));
+"""
+
+
+class _PageSlot:
+    """Contexto + página reutilizáveis entre renderizações"""
+
+    def __init__(self, context, page, generation, scale=1):
+        self.context = context
+        self.page = page
+        self.generation = generation
+        self.scale = scale
+        self.renders = 0
+
+
+class PlaywrightBrowserPool:
+    """Chromium persistente (um por worker) com pool limitado de páginas reutilizáveis"""
+
+    def __init__(self, size=None, max_renders=None, launch_args=None, asset_bundle=None):
+        self.size = size or int(os.getenv('RENDER_POOL_SIZE', 2))
+        self.max_renders = max_renders or int(os.getenv('RENDER_PAGE_MAX_USES', 50))
+        self.launch_args = launch_args or CHROMIUM_ARGS
+        self.asset_bundle = asset_bundle
+
+        self._playwright = None
+        self._browser = None
+        self._generation = 0
+        self._idle = []
+        self._in_use = 0
+        self._semaphore = None
+        self._launch_lock = None
+
+        self.launches = 0
+        self.renders = 0
+        self.recycled = 0
+        self.crashes = 0
+
+    def _primitives(self):
+        # Criados sob demanda para ficarem presos ao loop que usa o pool
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+            self._launch_lock = asyncio.Lock()
+
+    def _browser_alive(self):
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _ensure_browser(self):
+        if self._browser_alive():
+            return self._browser
+
+        async with self._launch_lock:
+            if self._browser_alive():
+                return self._browser
+
+            if self._browser is not None:
+                # Browser caiu: descartar tudo que pertencia a ele
+                print("💥 Chromium desconectado, relançando...")
+                self.crashes += 1
+                await self._discard_browser()
+
+            from playwright.async_api import async_playwright
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            started = time.perf_counter()
+            with span('browser_launch', engine='playwright'):
+                self._browser = await self._playwright.chromium.launch(
+                    headless=True,
+                    args=self.launch_args
+                )
+            self._generation += 1
+            self.launches += 1
+            print(f"🚀 Chromium iniciado em {time.perf_counter() - started:.2f}s")
+            return self._browser
+
+    async def _discard_browser(self):
+        idle, self._idle = self._idle, []
+        for slot in idle:
+            await self._close_slot(slot)
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        self._browser = None
+
+    async def _new_slot(self, scale=1):
+        browser = await self._ensure_browser()
+        # O device scale factor é do contexto: previews reduzidos usam páginas próprias
+        context = await browser.new_context(device_scale_factor=scale)
+        if self.asset_bundle and (self.asset_bundle.available or self.asset_bundle.offline):
+            # Servir Tailwind/fontes/ícones do cache em memória em vez da rede
+            await context.route('**/*', self.asset_bundle.handle_route)
+        page = await context.new_page()
+        return _PageSlot(context, page, self._generation, scale)
+
+    async def _close_slot(self, slot):
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    def _slot_usable(self, slot):
+        return (
+            slot.generation == self._generation
+            and slot.renders < self.max_renders
+            and not slot.page.is_closed()
+        )
+
+    def _pop_idle(self, scale):
+        """Página ociosa mais recente com a escala pedida"""
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].scale == scale:
+                return self._idle.pop(i)
+        return None
+
+    async def _acquire(self, scale=1):
+        self._primitives()
+        await self._semaphore.acquire()
+        try:
+            await self._ensure_browser()
+            while True:
+                slot = self._pop_idle(scale)
+                if slot is None:
+                    # Sem página dessa escala: a ociosa mais antiga (de outra escala) dá lugar à nova
+                    if len(self._idle) >= self.size:
+                        await self._close_slot(self._idle.pop(0))
+                    slot = await self._new_slot(scale)
+                    break
+                if self._slot_usable(slot):
+                    break
+                await self._close_slot(slot)
+            self._in_use += 1
+            return slot
+        except Exception:
+            self._semaphore.release()
+            raise
+
+    async def _release(self, slot, healthy):
+        try:
+            self._in_use -= 1
+            slot.renders += 1
+            self.renders += 1
+
+            if healthy and self._slot_usable(slot) and self._browser_alive():
+                try:
+                    # Resetar estado entre jobs
+                    await slot.page.goto('about:blank')
+                    await slot.context.clear_cookies()
+                    self._idle.append(slot)
+                    return
+                except Exception:
+                    pass
+
+            self.recycled += 1
+            await self._close_slot(slot)
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def page(self, width=1080, height=1080, scale=1):
+        """Empresta uma página do pool já com o viewport (e o device scale factor) configurado"""
+        slot = await self._acquire(scale)
+        healthy = False
+        try:
+            await slot.page.set_viewport_size({"width": width, "height": height})
+            yield slot.page
+            healthy = True
+        finally:
+            await self._release(slot, healthy)
+
+    async def start(self):
+        """Lança o Chromium antecipadamente"""
+        self._primitives()
+        await self._ensure_browser()
+
+    async def health_check(self, timeout=5):
+        """Verifica se o browser responde e retorna o estado do pool"""
+        status = self.stats()
+        try:
+            async def probe():
+                async with self.page(100, 100) as page:
+                    return await page.evaluate('1 + 1')
+            status['healthy'] = await asyncio.wait_for(probe(), timeout) == 2
+        except Exception as e:
+            status['healthy'] = False
+            status['error'] = str(e)
+        return status
+
+    def stats(self):
+        return {
+            'engine': 'playwright',
+            'browser_connected': self._browser_alive(),
+            'pool_size': self.size,
+            'idle': len(self._idle),
+            'in_use': self._in_use,
+            'launches': self.launches,
+            'renders': self.renders,
+            'recycled': self.recycled,
+            'crashes': self.crashes,
+        }
+
+    async def close(self):
+        await self._discard_browser()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+class _DriverSlot:
+    """WebDriver reutilizável entre renderizações"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.renders = 0
+
+
+class SeleniumDriverPool:
+    """Pool de WebDrivers pré-iniciados, emprestados por renderização"""
+
+    def __init__(self, arguments, size=None, max_renders=None, ready_timeout=None, settle_ms=None):
+        # Argumentos do Chrome; as Options do Selenium só são montadas no primeiro driver
+        self.arguments = list(arguments)
+        self.size = size or int(os.getenv('SELENIUM_POOL_SIZE', 2))
+        self.max_renders = max_renders or int(os.getenv('RENDER_PAGE_MAX_USES', 50))
+        self.ready_timeout = ready_timeout or int(os.getenv('RENDER_READY_TIMEOUT', 15))
+        self.settle_ms = SETTLE_MS if settle_ms is None else settle_ms
+
+        self._idle = queue.LifoQueue()
+        self._semaphore = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._in_use = 0
+
+        self.launches = 0
+        self.renders = 0
+        self.recycled = 0
+
+    def _new_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        options = Options()
+        for argument in self.arguments:
+            options.add_argument(argument)
+
+        started = time.perf_counter()
+        with span('browser_launch', engine='selenium'):
+            driver = webdriver.Chrome(options=options)
+        driver.set_script_timeout(self.ready_timeout)
+        with self._lock:
+            self.launches += 1
+        print(f"🚀 ChromeDriver iniciado em {time.perf_counter() - started:.2f}s")
+        return _DriverSlot(driver)
+
+    def _quit(self, slot):
+        try:
+            slot.driver.quit()
+        except Exception:
+            pass
+
+    def prestart(self, count=None):
+        """Inicia drivers antecipadamente para que o primeiro render não pague o cold start"""
+        count = min(count or self.size, self.size)
+        while self._idle.qsize() < count:
+            try:
+                self._idle.put(self._new_driver())
+            except Exception as e:
+                print(f"⚠️  Falha ao pré-iniciar ChromeDriver: {e}")
+                return
+
+    def prestart_in_background(self, count=None):
+        threading.Thread(target=self.prestart, args=(count,), name='selenium-prestart', daemon=True).start()
+
+    def _acquire(self):
+        self._semaphore.acquire()
+        try:
+            try:
+                slot = self._idle.get_nowait()
+            except queue.Empty:
+                slot = self._new_driver()
+            with self._lock:
+                self._in_use += 1
+            return slot
+        except Exception:
+            self._semaphore.release()
+            raise
+
+    def _release(self, slot, healthy):
+        try:
+            slot.renders += 1
+            with self._lock:
+                self._in_use -= 1
+                self.renders += 1
+
+            if healthy and slot.renders < self.max_renders:
+                try:
+                    # Resetar estado entre jobs
+                    slot.driver.get('about:blank')
+                    slot.driver.delete_all_cookies()
+                    self._idle.put(slot)
+                    return
+                except Exception:
+                    pass
+
+            with self._lock:
+                self.recycled += 1
+            self._quit(slot)
+        finally:
+            self._semaphore.release()
+
+    @contextmanager
+    def driver(self, width=1080, height=1080, scale=1):
+        """Empresta um driver do pool já com o tamanho de janela configurado.
+
+        scale != 1 emula o device scale factor via CDP (Chrome) só durante o empréstimo."""
+        slot = self._acquire()
+        healthy = False
+        try:
+            slot.driver.set_window_size(width, height)
+            if scale != 1:
+                slot.driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+                    'width': width, 'height': height, 'deviceScaleFactor': scale, 'mobile': False
+                })
+            yield slot.driver
+            if scale != 1:
+                slot.driver.execute_cdp_cmd('Emulation.clearDeviceMetricsOverride', {})
+            healthy = True
+        finally:
+            self._release(slot, healthy)
+
+    def load(self, driver, html_content, settle=True):
+        """Carrega o HTML sem arquivo temporário e aguarda a página ficar pronta"""
+        encoded = base64.b64encode(html_content.encode('utf-8')).decode('ascii')
+        url = f'data:text/html;charset=utf-8;base64,{encoded}'
+
+        if len(url) <= MAX_DATA_URL:
+            driver.get(url)
+        else:
+            driver.execute_script("document.open(); document.write(arguments[0]); document.close();", html_content)
+
+        self.wait_until_ready(driver, settle)
+
+    def wait_until_ready(self, driver, settle=True):
+        """Aguarda document ready, fontes carregadas e o tempo de acomodação configurado"""
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        WebDriverWait(driver, self.ready_timeout).until(
+            lambda d: d.execute_script('return document.readyState') == 'complete'
+        )
+        driver.execute_async_script(WAIT_FONTS_JS)
+
+        if settle and self.settle_ms:
+            time.sleep(self.settle_ms / 1000)
+
+    def stats(self):
+        return {
+            'engine': 'selenium',
+            'pool_size': self.size,
+            'idle': self._idle.qsize(),
+            'in_use': self._in_use,
+            'launches': self.launches,
+            'renders': self.renders,
+            'recycled': self.recycled,
+        }
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
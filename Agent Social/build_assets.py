@@ -0,0 +1,131 @@
+"""Gera o bundle offline de assets usado pelos renderizadores.
+
+Uso:
+    python build_assets.py
+
+Baixa as fontes e o Font Awesome referenciados pelos templates (incluindo os
+arquivos apontados por url(...) nos CSS) e compila o Tailwind com o safelist
+de tailwind.config.js. O resultado fica em static/vendor/ com um manifest.json
+mapeando cada URL original para o arquivo local.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import subprocess
+import sys
+import tempfile
+import urllib.request
+from urllib.parse import urljoin, urlparse
+
+from assets import (
+    CSS_URL_RE,
+    MANIFEST_FILE,
+    TEMPLATE_ASSET_URLS,
+    VENDOR_DIR,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# O Google Fonts devolve woff2 apenas para browsers modernos
+USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+)
+
+TAILWIND_INPUT = "@tailwind base;\n@tailwind components;\n@tailwind utilities;\n"
+
+
+def fetch(url):
+    req = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        content_type = response.headers.get_content_type()
+        return response.read(), content_type
+
+
+def local_name(url, content_type):
+    path = urlparse(url).path
+    ext = os.path.splitext(path)[1] or mimetypes.guess_extension(content_type) or ''
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + ext
+
+
+def vendor_url(url, assets, failures):
+    """Baixa a URL (e recursivamente os url(...) de CSS) para o diretório vendor"""
+    if url in assets:
+        return
+
+    try:
+        body, content_type = fetch(url)
+    except Exception as e:
+        print(f"❌ Falha ao baixar {url}: {e}")
+        failures.append(url)
+        return
+
+    filename = local_name(url, content_type)
+    with open(os.path.join(VENDOR_DIR, filename), 'wb') as f:
+        f.write(body)
+    assets[url] = {'file': filename, 'content_type': content_type}
+    print(f"✅ {url} -> {filename} ({len(body)} bytes)")
+
+    if content_type == 'text/css':
+        for match in CSS_URL_RE.finditer(body.decode('utf-8')):
+            ref = match.group(2)
+            if not ref.startswith('data:'):
+                vendor_url(urljoin(url, ref), assets, failures)
+
+
+def build_tailwind():
+    """Compila o Tailwind com o safelist das classes permitidas no prompt"""
+    output = os.path.join(VENDOR_DIR, 'tailwind.css')
+    with tempfile.NamedTemporaryFile('w', suffix='.css', delete=False) as f:
+        f.write(TAILWIND_INPUT)
+        input_path = f.name
+
+    try:
+        subprocess.run(
+            [
+                'npx', '--yes', 'tailwindcss@3',
+                '-c', os.path.join(BASE_DIR, 'tailwind.config.js'),
+                '-i', input_path,
+                '-o', output,
+                '--minify',
+            ],
+            cwd=BASE_DIR,
+            check=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"❌ Falha ao compilar Tailwind (requer Node.js/npx): {e}")
+        return None
+    finally:
+        os.unlink(input_path)
+
+    print(f"✅ Tailwind compilado ({os.path.getsize(output)} bytes)")
+    return 'tailwind.css'
+
+
+def main():
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+
+    assets = {}
+    failures = []
+    for url in TEMPLATE_ASSET_URLS:
+        vendor_url(url, assets, failures)
+    tailwind = build_tailwind()
+
+    # Bundle incompleto não ganha manifest: o app não deve tratá-lo como pronto para RENDER_OFFLINE
+    if failures or not tailwind:
+        print(f"❌ Bundle incompleto ({len(failures)} downloads falharam, Tailwind "
+              f"{'ok' if tailwind else 'não compilado'}); manifest não foi escrito")
+        return 1
+
+    manifest_path = os.path.join(VENDOR_DIR, MANIFEST_FILE)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'assets': assets, 'tailwind': tailwind}, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    print(f"📦 Bundle gerado em {VENDOR_DIR}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+import io
+import os
+
+from metrics import GIF_BYTES, GIF_FRAMES, GIF_PIXELS, span
+
+# numpy e Pillow são importados no primeiro encode: o import do app fica leve
+
+# Esforço de compressão: fast (menos CPU), balanced ou small (arquivos menores)
+ENCODE_PRESET = os.getenv('ENCODE_PRESET', 'balanced')
+
+# Parâmetros do Pillow por formato e preset (iguais para Playwright e Selenium)
+ENCODE_PRESETS = {
+    'fast': {
+        'png': {'compress_level': 1},
+        'jpeg': {'quality': 90, 'subsampling': '4:2:0'},
+        'webp': {'quality': 85, 'method': 0},
+        'avif': {'quality': 70, 'speed': 10},
+    },
+    'balanced': {
+        'png': {'compress_level': 6},
+        'jpeg': {'quality': 90, 'optimize': True, 'subsampling': '4:2:0'},
+        'webp': {'quality': 85, 'method': 4},
+        'avif': {'quality': 65, 'speed': 8},
+    },
+    'small': {
+        'png': {'optimize': True},
+        'jpeg': {'quality': 85, 'optimize': True, 'progressive': True, 'subsampling': '4:2:0'},
+        'webp': {'quality': 80, 'method': 6},
+        'avif': {'quality': 60, 'speed': 6},
+    },
+}
+
+# Diferença por canal considerada ruído (antialiasing) ao comparar frames do GIF
+GIF_DIFF_THRESHOLD = int(os.getenv('GIF_DIFF_THRESHOLD', 8))
+# Pixels usados para calcular a paleta global (amostra dos frames)
+GIF_PALETTE_SAMPLE = int(os.getenv('GIF_PALETTE_SAMPLE', 1_000_000))
+# Também codifica do jeito antigo para medir a economia (custa um encode extra)
+GIF_MEASURE_SAVINGS = os.getenv('GIF_MEASURE_SAVINGS', '0') == '1'
+
+# Tamanhos derivados de uma única captura: escala sobre o viewport da plataforma
+OUTPUT_SCALES = {'retina': 2.0, 'standard': 1.0}
+OUTPUT_SIZES = ('retina', 'standard', 'thumbnail')
+# Largura da miniatura (altura proporcional)
+THUMBNAIL_WIDTH = int(os.getenv('THUMBNAIL_WIDTH', 320))
+# Device scale factor da captura usada para derivar os tamanhos (o maior deles)
+CAPTURE_SCALE = float(os.getenv('CAPTURE_SCALE', 2))
+
+# Formatos estáticos e o nome usado pelo Pillow
+STILL_FORMATS = {
+    'png': 'png',
+    'jpg': 'jpeg',
+    'jpeg': 'jpeg',
+    'webp': 'webp',
+    'avif': 'avif',
+}
+
+
+def resolve_preset(preset=None):
+    preset = preset or ENCODE_PRESET
+    if preset not in ENCODE_PRESETS:
+        print(f"⚠️  Preset de encoding desconhecido '{preset}', usando balanced")
+        return 'balanced'
+    return preset
+
+
+def format_supported(format):
+    """WebP/AVIF dependem de como o Pillow foi compilado"""
+    from PIL import features
+
+    codec = STILL_FORMATS.get(format)
+    if codec in ('webp', 'avif'):
+        return features.check(codec)
+    return codec is not None
+
+
+class CaptureTooSmall(Exception):
+    """A captura não tem resolução para o tamanho pedido (seria ampliada e rotulada errado)"""
+
+
+def _opaque(img):
+    return img.getchannel('A').getextrema()[0] == 255
+
+
+def drop_opaque_alpha(img):
+    """Descarta o canal alfa quando não há transparência de fato (RGBA opaco -> RGB)"""
+    if img.mode in ('RGBA', 'LA') and _opaque(img):
+        return img.convert('RGB')
+    return img
+
+
+def flatten(img, background=(255, 255, 255)):
+    """RGBA -> RGB sobre fundo sólido, sem máscaras por canal"""
+    from PIL import Image
+
+    if img.mode == 'RGB':
+        return img
+    if img.mode not in ('RGBA', 'LA', 'P'):
+        return img.convert('RGB')
+
+    img = img.convert('RGBA')
+    # Screenshots quase sempre são opacos: basta descartar o alfa
+    if _opaque(img):
+        return img.convert('RGB')
+    base = Image.new('RGBA', img.size, background + (255,))
+    return Image.alpha_composite(base, img).convert('RGB')
+
+
+def encode_image(image, format, preset=None, scale=None):
+    """Codifica um screenshot (bytes PNG ou Image) no formato pedido com o preset de esforço.
+
+    scale reduz a imagem antes (engines sem device scale factor por página, como o Selenium)."""
+    from PIL import Image
+
+    codec = STILL_FORMATS[format]
+    if not format_supported(format):
+        raise ValueError(f"Formato {format} não suportado por este Pillow")
+
+    with span('encode', format=format):
+        img = Image.open(io.BytesIO(image)) if isinstance(image, (bytes, bytearray)) else image
+        if scale and scale != 1:
+            img = img.resize(
+                (max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.Resampling.BILINEAR
+            )
+        params = ENCODE_PRESETS[resolve_preset(preset)][codec]
+
+        # Apenas PNG preserva transparência; os demais recebem fundo branco
+        if codec == 'png':
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')
+        else:
+            img = flatten(img)
+
+        output = io.BytesIO()
+        img.save(output, format=codec.upper(), **params)
+        return output.getvalue()
+
+
+def output_dimensions(size, viewport):
+    """(largura, altura) de um tamanho de saída para o viewport da plataforma"""
+    width, height = viewport
+    if size == 'thumbnail':
+        return THUMBNAIL_WIDTH, max(1, round(height * THUMBNAIL_WIDTH / width))
+    scale = OUTPUT_SCALES[size]
+    return round(width * scale), round(height * scale)
+
+
+def check_capture(capture, viewport, scale):
+    """Confere se o engine respeitou o device scale factor (só lê o cabeçalho do PNG)"""
+    from PIL import Image
+
+    width, height = Image.open(io.BytesIO(capture)).size
+    expected = round(viewport[0] * scale), round(viewport[1] * scale)
+    if width < expected[0] or height < expected[1]:
+        raise CaptureTooSmall(
+            f"Captura {width}x{height} menor que o esperado em {scale}x ({expected[0]}x{expected[1]})"
+        )
+
+
+@span('derive')
+def derive_sizes(capture, viewport, outputs, preset=None):
+    """Codifica cada (formato, tamanho) a partir de uma captura em alta densidade, sem voltar ao browser.
+
+    Os tamanhos são reduzidos do maior para o menor, cada um a partir do anterior; com
+    reducing_gap o Pillow faz o grosso da redução com box filter inteiro e só o fim com Lanczos."""
+    from PIL import Image
+
+    source = Image.open(io.BytesIO(capture))
+    source.load()
+    # Screenshots quase sempre são opacos: o alfa só fica se houver transparência
+    source = drop_opaque_alpha(source)
+    sizes = sorted(
+        {size for _, size in outputs}, key=lambda size: output_dimensions(size, viewport)[0], reverse=True
+    )
+    captured = source.size
+    images = {}
+    for size in sizes:
+        target = output_dimensions(size, viewport)
+        # Nunca amplia: uma captura menor que o alvo sairia como retina com pixels de 1x
+        if target[0] > captured[0] or target[1] > captured[1]:
+            raise CaptureTooSmall(
+                f"Captura {captured[0]}x{captured[1]} menor que o tamanho {size} "
+                f"({target[0]}x{target[1]}); aumente CAPTURE_SCALE ou use um engine com device scale factor"
+            )
+        if target != source.size:
+            source = source.resize(target, Image.Resampling.LANCZOS, reducing_gap=2.0)
+        images[size] = source
+    return {(format, size): encode_image(images[size], format, preset) for format, size in outputs}
+
+
+def _changed_box(frame, canvas):
+    """Bounding box (left, top, right, bottom) dos pixels que mudaram além do limiar, ou None"""
+    import numpy as np
+
+    # |a - b| em uint8 sem overflow nem cópia para int16
+    changed = (np.maximum(frame, canvas) - np.minimum(frame, canvas)) > GIF_DIFF_THRESHOLD
+    rows = np.flatnonzero(changed.reshape(changed.shape[0], -1).any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(changed[rows[0]:rows[-1] + 1].any(axis=(0, 2)))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def _naive_gif(frames, duration):
+    from PIL import Image
+
+    output = io.BytesIO()
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(output, format='GIF', save_all=True, append_images=images[1:],
+                   duration=duration, loop=0, optimize=True)
+    return len(output.getvalue())
+
+
+@span('encode', format='gif')
+def encode_gif(screenshots, duration):
+    """Monta o GIF: descarta frames repetidos, recorta só a região alterada e usa uma paleta global"""
+    import numpy as np
+    from PIL import Image
+
+    frames = [np.asarray(flatten(Image.open(io.BytesIO(data)))) for data in screenshots]
+
+    # 1. Frames sem mudança visível estendem a duração do anterior; os demais só
+    #    atualizam a região alterada, o resto fica idêntico ao frame anterior
+    canvas = frames[0]
+    updates = [((0, 0) + (canvas.shape[1], canvas.shape[0]), canvas)]
+    durations = [duration]
+    for frame in frames[1:]:
+        box = _changed_box(frame, canvas)
+        if box is None:
+            durations[-1] += duration
+            continue
+        left, top, right, bottom = box
+        canvas = canvas.copy()
+        canvas[top:bottom, left:right] = frame[top:bottom, left:right]
+        updates.append((box, frame[top:bottom, left:right]))
+        durations.append(duration)
+
+    # 2. Paleta global calculada sobre o primeiro frame + regiões alteradas
+    pixels = np.concatenate([region.reshape(-1, 3) for _, region in updates])
+    if len(pixels) > GIF_PALETTE_SAMPLE:
+        pixels = pixels[::len(pixels) // GIF_PALETTE_SAMPLE + 1]
+    # 255 cores: sobra um índice para a transparência dos pixels inalterados
+    palette = Image.fromarray(pixels.reshape(-1, 1, 3)).quantize(colors=255, method=Image.Quantize.MEDIANCUT)
+
+    # 3. Quantiza só as regiões alteradas e cola sobre o frame anterior (já quantizado)
+    images = []
+    for box, region in updates:
+        quantized = Image.fromarray(np.ascontiguousarray(region)).quantize(
+            palette=palette, dither=Image.Dither.NONE
+        )
+        if images:
+            image = images[-1].copy()
+            image.paste(quantized, box[:2])
+        else:
+            image = quantized
+        images.append(image)
+
+    # 4. disposal=1 mantém o frame anterior: o Pillow grava só o retângulo alterado
+    #    e a paleta uma única vez (sem tabelas de cores locais)
+    output = io.BytesIO()
+    images[0].save(
+        output,
+        format='GIF',
+        save_all=True,
+        append_images=images[1:],
+        duration=durations,
+        loop=0,
+        disposal=1,
+        palette=palette.getpalette()[:768]
+    )
+    gif_bytes = output.getvalue()
+
+    # Economia em /metrics (nos workers segue junto com o resultado para o processo web)
+    GIF_FRAMES.inc(len(frames), kind='captured')
+    GIF_FRAMES.inc(len(frames) - len(images), kind='dropped')
+    GIF_PIXELS.inc(frames[0].shape[0] * frames[0].shape[1] * (len(frames) - 1), kind='captured')
+    GIF_PIXELS.inc(sum(region.shape[0] * region.shape[1] for _, region in updates[1:]), kind='recoded')
+    GIF_BYTES.inc(len(gif_bytes), kind='encoded')
+    if GIF_MEASURE_SAVINGS:
+        GIF_BYTES.inc(_naive_gif(frames, duration), kind='baseline')
+    return gif_bytes
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from admission import AdmissionRejected
+from llm_gateway import CircuitBreaker
+from metrics import FALLBACKS
+
+# Resultados recentes considerados por engine (taxa de sucesso e p95)
+ENGINE_WINDOW = int(os.getenv('ENGINE_WINDOW', 50))
+# Falhas seguidas que abrem o circuito do engine; após o cooldown uma renderização testa de novo
+ENGINE_BREAKER_THRESHOLD = int(os.getenv('ENGINE_BREAKER_THRESHOLD', 3))
+ENGINE_BREAKER_COOLDOWN = float(os.getenv('ENGINE_BREAKER_COOLDOWN', 30))
+# Hedging: se o engine principal passar do p95, inicia o segundo engine em paralelo
+ENGINE_HEDGE = os.getenv('ENGINE_HEDGE', '0') == '1'
+ENGINE_HEDGE_MIN_SAMPLES = int(os.getenv('ENGINE_HEDGE_MIN_SAMPLES', 10))
+ENGINE_HEDGE_MIN_DELAY = float(os.getenv('ENGINE_HEDGE_MIN_DELAY', 0.5))
+
+
+class EngineHealth:
+    """Janela deslizante de resultados + circuit breaker de um engine"""
+
+    def __init__(self, name, window=ENGINE_WINDOW):
+        self.name = name
+        self.breaker = CircuitBreaker(ENGINE_BREAKER_THRESHOLD, ENGINE_BREAKER_COOLDOWN)
+        self.results = deque(maxlen=window)  # (sucesso, segundos, formato)
+        self.skipped = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, ok, seconds, format):
+        self.results.append((ok, seconds, format))
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def success_rate(self):
+        results = list(self.results)
+        if not results:
+            return None
+        return sum(1 for ok, _, _ in results if ok) / len(results)
+
+    def latency_p95(self, format=None):
+        """p95 das renderizações bem-sucedidas (do formato, se informado); None com poucas amostras"""
+        latencies = sorted(
+            seconds for ok, seconds, f in list(self.results) if ok and (format is None or f == format)
+        )
+        if len(latencies) < ENGINE_HEDGE_MIN_SAMPLES:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def stats(self):
+        rate = self.success_rate()
+        p95 = self.latency_p95()
+        return {
+            'circuit': self.breaker.stats(),
+            'window': len(self.results),
+            'success_rate': round(rate, 4) if rate is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'skipped': self.skipped,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+        }
+
+
+class EngineRouter:
+    """Escolhe o engine de cada renderização pela saúde recente, em vez de sempre tentar o primeiro.
+
+    Engines com circuito aberto são pulados (sem pagar uma tentativa que vai falhar) e voltam
+    a ser testados após o cooldown; com ENGINE_HEDGE=1 renderizações lentas disparam o segundo
+    engine após o p95 do primeiro e vence quem terminar antes."""
+
+    def __init__(self, engines, hedge=ENGINE_HEDGE):
+        self.order = list(engines)
+        self.engines = {name: EngineHealth(name) for name in self.order}
+        self.hedge = hedge
+
+    def healthy(self, name):
+        """Engine disponível sem consumir a chamada de teste do circuito"""
+        engine = self.engines.get(name)
+        return engine is not None and engine.breaker.state != 'open'
+
+    async def _attempt(self, engine, format, attempt, hedge=False):
+        started = time.monotonic()
+        try:
+            result = await attempt(engine.name, hedge)
+        except (asyncio.CancelledError, AdmissionRejected):
+            # Cancelado (perdeu o hedge, cliente saiu) ou sem vaga: não diz nada sobre a saúde
+            engine.breaker.release_probe()
+            raise
+        except Exception:
+            engine.record(False, time.monotonic() - started, format)
+            raise
+        engine.record(True, time.monotonic() - started, format)
+        return result
+
+    async def _hedged(self, primary, secondary, format, attempt, tried):
+        delay = primary.latency_p95(format)
+        if not self.hedge or secondary is None or delay is None:
+            return await self._attempt(primary, format, attempt)
+
+        first = asyncio.ensure_future(self._attempt(primary, format, attempt))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=max(delay, ENGINE_HEDGE_MIN_DELAY))
+            if done or not secondary.breaker.allow():
+                return await first
+
+            print(f"🏁 {primary.name} passou do p95 ({delay:.1f}s) para {format}, iniciando {secondary.name} em paralelo")
+            secondary.hedges += 1
+            tried.append(secondary.name)
+            second = asyncio.ensure_future(self._attempt(secondary, format, attempt, hedge=True))
+            pending.add(second)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            secondary.hedge_wins += 1
+                        return task.result()
+                    # Hedge sem vaga no engine secundário: segue aguardando o principal
+                    if not isinstance(task.exception(), AdmissionRejected) or task is first:
+                        error = task.exception()
+            raise error
+        finally:
+            # Perdedor do hedge (ou tudo, se esta renderização foi cancelada)
+            for task in pending:
+                task.cancel()
+
+    async def render(self, format, attempt):
+        """Renderiza com attempt(engine, hedge) pelo primeiro engine saudável, com fallback para os demais"""
+        errors = []
+        tried = []
+        for i, name in enumerate(self.order):
+            engine = self.engines[name]
+            if name in tried:
+                continue
+            if not engine.breaker.allow():
+                engine.skipped += 1
+                continue
+
+            secondary = next(
+                (self.engines[other] for other in self.order[i + 1:] if self.healthy(other)), None
+            )
+            if tried:
+                print(f"🔄 Usando {name} como fallback...")
+                FALLBACKS.inc(kind=f'{tried[-1]}_to_{name}')
+            tried.append(name)
+            try:
+                # Se houver hedge, o secundário entra em `tried` e não é tentado de novo
+                return await self._hedged(engine, secondary, format, attempt, tried)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                print(f"❌ {name} falhou: {e}")
+                errors.append(f'{name}: {e}')
+
+        if not tried:
+            # Todos os circuitos abertos: tenta o engine preferido mesmo assim
+            engine = self.engines[self.order[0]]
+            print(f"⚠️  Todos os engines com circuito aberto, tentando {engine.name}")
+            try:
+                return await self._attempt(engine, format, attempt)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                errors.append(f'{engine.name}: {e}')
+
+        raise Exception("Todos os métodos de conversão falharam: " + '; '.join(errors))
+
+    async def render_with(self, name, format, attempt):
+        """Renderiza só com o engine indicado (ex: lote numa página do Playwright), sem fallback,
+        mas respeitando e atualizando o circuito dele"""
+        engine = self.engines.get(name)
+        if engine is None:
+            raise Exception(f"Engine {name} não disponível")
+        if not engine.breaker.allow():
+            engine.skipped += 1
+            raise Exception(f"Engine {name} com circuito aberto")
+        return await self._attempt(engine, format, attempt)
+
+    def stats(self):
+        return {
+            'order': self.order,
+            'hedge': self.hedge,
+            'engines': {name: engine.stats() for name, engine in self.engines.items()},
+        }
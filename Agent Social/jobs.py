@@ -0,0 +1,238 @@
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from admission import policy
+from runtime import background_loop
+
+# Concorrência por engine de renderização (imagens/GIF no browser, vídeo no browser + ffmpeg)
+# e para exportações em lote (cada uma já paraleliza internamente)
+JOB_CONCURRENCY = {
+    'image': int(os.getenv('JOB_IMAGE_CONCURRENCY', 2)),
+    'video': int(os.getenv('JOB_VIDEO_CONCURRENCY', 1)),
+    'batch': int(os.getenv('JOB_BATCH_CONCURRENCY', 1)),
+}
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', 600))
+# Teto de memória para resultados prontos (MP4/GIF/ZIP); acima dele os mais antigos saem antes do TTL
+JOB_RESULT_MAX_BYTES = int(os.getenv('JOB_RESULT_MAX_MB', 256)) * 1024 * 1024
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 100))
+
+TERMINAL_STATUSES = ('done', 'error')
+
+
+def sse_event(event, payload):
+    """Formata um evento Server-Sent Events com payload JSON"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+class RenderJob:
+    """Estado de um job de renderização, observável por polling ou SSE"""
+
+    def __init__(self, kind, render, format):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.format = format
+        self.render = render
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.error = None
+        self.result = None
+        self.mimetype = None
+        self.filename = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.version = 0
+        self._changed = threading.Condition()
+
+    def update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def report_progress(self, done, total):
+        """Callback de progresso passado ao renderizador (frames capturados)"""
+        self.update(stage='capturing', progress=round(done / total, 3) if total else 0.0)
+
+    def wait_for_change(self, version, timeout):
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    @property
+    def finished(self):
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'format': self.format,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'error': self.error,
+            'size': len(self.result) if self.result is not None else None,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    def sse_events(self, heartbeat=15):
+        """Gerador de Server-Sent Events com o progresso do job"""
+        version = -1
+        while True:
+            if self.version != version:
+                version = self.version
+                yield sse_event('progress', self.to_dict())
+                if self.finished:
+                    return
+            elif self.wait_for_change(version, heartbeat) == version:
+                yield ": heartbeat\n\n"
+
+
+class QueueFull(Exception):
+    """Fila de jobs cheia: 429 com Retry-After estimado pelo ritmo dos workers"""
+
+    status = 429
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class RenderJobQueue:
+    """Fila de jobs drenada por workers dedicados no loop compartilhado"""
+
+    def __init__(self, concurrency=None, result_ttl=JOB_RESULT_TTL, max_pending=JOB_MAX_PENDING,
+                 max_result_bytes=JOB_RESULT_MAX_BYTES):
+        self.concurrency = concurrency or JOB_CONCURRENCY
+        self.result_ttl = result_ttl
+        self.max_pending = max_pending
+        self.max_result_bytes = max_result_bytes
+        self.result_bytes = 0
+        self.evictions = 0
+        self._jobs = {}
+        self._queues = None
+        self._lock = threading.Lock()
+        # Média móvel da duração de um job, para estimar o Retry-After
+        self.run_avg = 5.0
+
+    def _start_workers(self):
+        """Inicia os workers no loop compartilhado (seguro tanto em views sync quanto async)"""
+        with self._lock:
+            if self._queues is not None:
+                return
+            self._queues = {kind: asyncio.Queue() for kind in self.concurrency}
+        for kind, workers in self.concurrency.items():
+            for i in range(workers):
+                background_loop.submit(self._worker(kind))
+        background_loop.submit(self._purge_periodically())
+        print(f"👷 Workers de renderização iniciados: {self.concurrency}")
+
+    async def _worker(self, kind):
+        queue = self._queues[kind]
+        while True:
+            job = await queue.get()
+            try:
+                await self._run(job)
+            finally:
+                queue.task_done()
+
+    async def _purge_periodically(self):
+        """Libera resultados expirados mesmo sem novos submits (ex: depois de um pico)"""
+        while True:
+            await asyncio.sleep(max(1, min(60, self.result_ttl / 2)))
+            self._purge()
+
+    async def _run(self, job):
+        job.update(status='running', stage='rendering', started_at=time.time())
+        started = time.monotonic()
+        try:
+            # Job já aceito (202): espera a vaga de renderização sem prazo
+            with policy(patient=True):
+                data, mimetype, filename = await job.render(job.report_progress)
+            with self._lock:
+                self.result_bytes += len(data)
+            job.update(
+                status='done', stage='done', progress=1.0,
+                result=data, mimetype=mimetype, filename=filename,
+                finished_at=time.time()
+            )
+            self._purge()
+        except Exception as e:
+            print(f"❌ Job {job.id} falhou: {e}")
+            job.update(status='error', stage='error', error=str(e), finished_at=time.time())
+        finally:
+            job.render = None
+            self.run_avg = 0.8 * self.run_avg + 0.2 * (time.monotonic() - started)
+
+    def retry_after(self):
+        """Segundos até uma vaga na fila: o excedente dividido entre todos os workers"""
+        excess = max(self.pending() - self.max_pending + 1, 1)
+        workers = max(sum(self.concurrency.values()), 1)
+        return max(1, min(60, math.ceil(self.run_avg * excess / workers)))
+
+    def submit(self, kind, render, format):
+        """Enfileira um job; render é uma corrotina fn(report_progress) -> (bytes, mimetype, filename)"""
+        self._start_workers()
+        self._purge()
+
+        with self._lock:
+            if self.pending() >= self.max_pending:
+                raise QueueFull(
+                    f'Fila de renderização cheia ({self.max_pending} jobs pendentes)', self.retry_after()
+                )
+            job = RenderJob(kind, render, format)
+            self._jobs[job.id] = job
+
+        background_loop.loop.call_soon_threadsafe(self._queues[kind].put_nowait, job)
+        return job
+
+    def get(self, job_id):
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def pending(self):
+        return sum(1 for job in list(self._jobs.values()) if not job.finished)
+
+    def _drop(self, job_id):
+        job = self._jobs.pop(job_id)
+        if job.result is not None:
+            self.result_bytes -= len(job.result)
+
+    def _purge(self):
+        """Descarta jobs finalizados há mais de JOB_RESULT_TTL segundos e, acima de
+        JOB_RESULT_MAX_MB, os resultados mais antigos"""
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at
+            )
+            for job in finished:
+                if now - job.finished_at > self.result_ttl:
+                    self._drop(job.id)
+                # O resultado mais recente fica mesmo sozinho acima do teto (o cliente ainda vai buscá-lo)
+                elif self.result_bytes > self.max_result_bytes and job.result is not None and job is not finished[-1]:
+                    self._drop(job.id)
+                    self.evictions += 1
+
+    def stats(self):
+        jobs = list(self._jobs.values())
+        return {
+            'concurrency': self.concurrency,
+            'queued': sum(1 for job in jobs if job.status == 'queued'),
+            'running': sum(1 for job in jobs if job.status == 'running'),
+            'done': sum(1 for job in jobs if job.status == 'done'),
+            'error': sum(1 for job in jobs if job.status == 'error'),
+            'result_bytes': self.result_bytes,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 86400))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000))
+LLM_CACHE_PATH = os.getenv(
+    'LLM_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'agent-social-llm-cache.sqlite3')
+)
+
+
+def normalize_prompt(prompt):
+    """Ignora diferenças irrelevantes: espaços extras e maiúsculas/minúsculas"""
+    return re.sub(r'\s+', ' ', prompt).strip().casefold()
+
+
+class LLMResponseCache:
+    """Cache persistente (SQLite) de respostas do LLM com TTL, limite de entradas e métricas"""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES,
+                 enabled=LLM_CACHE_ENABLED):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.saved_tokens = 0
+
+        if self.enabled:
+            with self._conn() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        tokens INTEGER NOT NULL,
+                        expires_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                ''')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_accessed ON llm_cache (accessed_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def key(self, kind, prompt, model, **params):
+        """Chave a partir do tipo de chamada, prompt normalizado, modelo e parâmetros"""
+        payload = json.dumps({
+            'kind': kind,
+            'prompt': normalize_prompt(prompt),
+            'model': model,
+            'params': params,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, regenerate=False):
+        """Retorna a resposta em cache; regenerate=True ignora o cache (mas o resultado novo é gravado)"""
+        if not self.enabled:
+            return None
+        if regenerate:
+            with self._lock:
+                self.bypasses += 1
+            return None
+
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                'SELECT response, tokens FROM llm_cache WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_tokens += row[1]
+        return row[0]
+
+    def put(self, key, response, tokens=0):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, response, tokens, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, response, tokens or 0, now + self.ttl, now)
+            )
+            conn.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (now,))
+            # Manter apenas as entradas usadas mais recentemente
+            conn.execute(
+                'DELETE FROM llm_cache WHERE key NOT IN '
+                '(SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT ?)',
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'saved_tokens': self.saved_tokens,
+        }
@@ -0,0 +1,291 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+
+from runtime import background_loop
+
+LLM_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
+
+# Prazo total por chamada (inclui fila, retries e backoff) - o reasoner é lento
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', 180))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 5))
+# Tempo máximo sem receber bytes do upstream (também vale entre chunks do streaming)
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 120))
+
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 0.5))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 8))
+
+# Chamadas simultâneas ao upstream; cada uma usa uma conexão do pool keep-alive do SDK
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', 8))
+
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', 5))
+LLM_BREAKER_COOLDOWN = float(os.getenv('LLM_BREAKER_COOLDOWN', 30))
+
+
+def retryable_errors():
+    """Erros transitórios: vale a pena tentar de novo e contam para o circuit breaker.
+
+    O SDK da OpenAI (e o httpx) só é importado na primeira chamada ao LLM."""
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.InternalServerError,
+        openai.APIConnectionError,  # inclui APITimeoutError
+    )
+
+
+class LLMSetupError(Exception):
+    """Cliente do LLM não pôde ser criado (SDK ausente, chave ou configuração inválida).
+
+    Não é falha transitória: não vira conteúdo de fallback nem conta para o circuit breaker."""
+
+
+class CircuitOpenError(Exception):
+    """Upstream degradado: a chamada falha imediatamente sem ir ao DeepSeek"""
+
+
+class CircuitBreaker:
+    """Abre após N falhas seguidas; após o cooldown deixa passar uma chamada de teste"""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """Chamada de teste cancelada (ex: cliente desconectou): libera para outra"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.threshold:
+                if self.opened_at is None or self._probing:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures,
+            'trips': self.trips,
+            'rejected': self.rejected,
+        }
+
+
+def backoff_delay(attempt, error=None):
+    """Backoff exponencial com jitter completo; respeita Retry-After quando o upstream envia"""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+class LLMGateway:
+    """Acesso ao LLM com pool de conexões, prazos, retries, limite de concorrência e circuit breaker"""
+
+    def __init__(self, api_key=None, base_url=LLM_BASE_URL, concurrency=LLM_CONCURRENCY,
+                 max_retries=LLM_MAX_RETRIES, deadline=LLM_DEADLINE, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+
+        # Criados sob demanda dentro do loop compartilhado
+        self._client = None
+        self._semaphore = None
+
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def _ensure_client(self):
+        if self._client is None:
+            try:
+                import openai
+
+                # Um único cliente HTTP (keep-alive) para todas as chamadas do processo; timeouts e
+                # cliente vêm do próprio SDK, que escolhe a biblioteca HTTP da versão instalada
+                timeout = openai.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+                self._client = openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    timeout=timeout,
+                    max_retries=0,  # retries ficam a cargo do gateway
+                    http_client=openai.DefaultAsyncHttpxClient(timeout=timeout)
+                )
+            except Exception as e:
+                raise LLMSetupError(f"Cliente do LLM indisponível: {e}") from e
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    async def _attempts(self, call, consume=None):
+        """Executa call() com retries em erros transitórios, sob o semáforo global.
+
+        consume(resultado), quando informado, roda ainda dentro do semáforo e sem retries."""
+        # Antes do allow(): erro de configuração não pode levar a chamada de teste do half-open
+        client = self._ensure_client()
+        if not self.breaker.allow():
+            raise CircuitOpenError('LLM indisponível (circuit breaker aberto)')
+
+        import openai
+
+        retryable = retryable_errors()
+        self.calls += 1
+        attempt = 0
+        try:
+            while True:
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        result = await call(client)
+                    except retryable as e:
+                        error = e
+                    else:
+                        self.breaker.record_success()
+                        return await consume(result) if consume else result
+                    finally:
+                        self.in_flight -= 1
+
+                if attempt >= self.max_retries:
+                    self.failures += 1
+                    self.breaker.record_failure()
+                    raise error
+
+                # O backoff acontece fora do semáforo para não segurar vagas
+                delay = backoff_delay(attempt, error)
+                print(f"⚠️  LLM falhou ({type(error).__name__}), tentativa {attempt + 1}; nova tentativa em {delay:.1f}s")
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except openai.APIError as e:
+            # Erro do upstream que não vale retry (400/401/422, stream interrompido)
+            if not isinstance(e, retryable):
+                self.failures += 1
+                self.breaker.record_failure()
+            raise
+        except Exception:
+            # Erro do lado do cliente (validação do SDK, stream vazio): o upstream não falhou
+            self.breaker.release_probe()
+            raise
+
+    async def _with_deadline(self, coro, deadline):
+        try:
+            return await asyncio.wait_for(coro, deadline or self.deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise
+
+    async def chat(self, deadline=None, **params):
+        """chat.completions.create com prazo total; params são os do SDK da OpenAI"""
+        return await self._with_deadline(
+            self._attempts(lambda client: client.chat.completions.create(**params)),
+            deadline
+        )
+
+    def stream(self, deadline=None, **params):
+        """Gerador síncrono com os chunks de uma chamada stream=True.
+
+        Os retries só acontecem antes do primeiro chunk; o prazo vale para o stream inteiro."""
+        chunks = queue.Queue()
+        done = object()
+
+        async def open_stream(client):
+            stream = await client.chat.completions.create(stream=True, **params)
+            iterator = stream.__aiter__()
+            # A chamada só conta como bem-sucedida depois do primeiro chunk
+            return iterator, await iterator.__anext__()
+
+        async def forward(opened):
+            iterator, first = opened
+            chunks.put_nowait(first)
+            async for chunk in iterator:
+                chunks.put_nowait(chunk)
+
+        async def produce():
+            try:
+                await self._with_deadline(self._attempts(open_stream, forward), deadline)
+            except StopAsyncIteration:
+                pass
+            except Exception as e:
+                chunks.put_nowait(e)
+            finally:
+                chunks.put_nowait(done)
+
+        future = background_loop.submit(produce())
+        try:
+            while True:
+                item = chunks.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # Cliente desconectou: cancela a chamada upstream
+            future.cancel()
+
+    def stats(self):
+        return {
+            'concurrency': self.concurrency,
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'circuit': self.breaker.stats(),
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
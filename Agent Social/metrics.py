@@ -0,0 +1,282 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Loga as etapas de cada request (também ativável por request com o header X-Trace: 1)
+TRACE_REQUESTS = os.getenv('TRACE_REQUESTS', '0') == '1'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Rótulos herdados por todos os spans do fluxo atual (plataforma, formato, engine)
+_tags = contextvars.ContextVar('metric_tags', default={})
+# Spans do request atual quando o trace está ligado
+_trace = contextvars.ContextVar('metric_trace', default=None)
+# Nos workers de renderização as observações são enviadas ao processo web
+_outbox = None
+# O worker atende várias renderizações ao mesmo tempo (loop e threads de encode)
+_outbox_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        self._apply(self._key(labels), amount)
+        _forward(self.name, labels, amount)
+
+    def _apply(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def observe(self, value, **labels):
+        self._apply(self._key(labels), value)
+        _forward(self.name, labels, value)
+
+    def _apply(self, key, value):
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def totals(self):
+        """{rótulos: (soma, contagem)} - usado pelo benchmark para o tempo por etapa"""
+        with self._lock:
+            return {key: (state[-2], state[-1]) for key, state in self._values.items()}
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", bound)])} {count}'
+            yield f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", "+Inf")])} {state[-1]}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}'
+
+
+class Collected:
+    """Valor lido na hora da coleta; fn retorna um número ou {valor_do_rótulo: número}"""
+
+    def __init__(self, name, help, fn, labelname=None, kind='gauge'):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.fn = fn
+        self.labelname = labelname
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"⚠️  Falha ao coletar {self.name}: {e}")
+            return
+        if isinstance(value, dict):
+            for label, number in sorted(value.items()):
+                if number is not None:
+                    yield f'{self.name}{_format_labels((self.labelname,), (label,))} {number}'
+        elif value is not None:
+            yield f'{self.name} {value}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def on_collect(self, fn):
+        """fn() roda uma vez no início de cada coleta (ex: uma consulta lida por várias gauges)"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        """Exposição no formato texto do Prometheus"""
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️  Falha ao coletar {getattr(fn, '__name__', fn)}: {e}")
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    'agent_stage_seconds', 'Duração de cada etapa (llm, browser_launch, page_load, screenshot, encode, ...)',
+    ('stage', 'platform', 'format', 'engine')
+))
+HTTP_SECONDS = registry.register(Histogram(
+    'agent_http_request_seconds', 'Duração dos requests HTTP', ('endpoint', 'method', 'status')
+))
+RENDERS = registry.register(Counter(
+    'agent_renders_total', 'Renderizações concluídas por engine', ('engine', 'format')
+))
+FALLBACKS = registry.register(Counter(
+    'agent_fallbacks_total', 'Fallbacks acionados', ('kind',)
+))
+GIF_FRAMES = registry.register(Counter(
+    'agent_gif_frames_total', 'Frames de GIF capturados e descartados por não mudarem', ('kind',)
+))
+GIF_PIXELS = registry.register(Counter(
+    'agent_gif_pixels_total', 'Pixels dos frames após o primeiro: capturados e recodificados', ('kind',)
+))
+GIF_BYTES = registry.register(Counter(
+    'agent_gif_bytes_total', 'Bytes dos GIFs gerados e do encode ingênuo (GIF_MEASURE_SAVINGS=1)', ('kind',)
+))
+
+
+def gauge(name, help, fn, labelname=None):
+    return registry.register(Collected(name, help, fn, labelname))
+
+
+def collected_counter(name, help, fn, labelname=None):
+    """Contador mantido por outro componente (ex: hits do cache), lido na coleta"""
+    return registry.register(Collected(name, help, fn, labelname, kind='counter'))
+
+
+def _forward(name, labels, value):
+    if _outbox is not None:
+        with _outbox_lock:
+            _outbox.append((name, labels, value))
+
+
+def start_forwarding():
+    """Chamado nos workers de renderização: as observações passam a ser enviadas ao processo web"""
+    global _outbox
+    _outbox = []
+
+
+def drain():
+    """Observações acumuladas desde a última chamada (worker -> processo web)"""
+    if _outbox is None:
+        return []
+    with _outbox_lock:
+        events = list(_outbox)
+        _outbox.clear()
+    return events
+
+
+def replay(events):
+    """Aplica no processo web as observações vindas de um worker"""
+    for name, labels, value in events:
+        metric = registry.get(name)
+        if metric is None:
+            continue
+        metric._apply(metric._key(labels), value)
+        if metric is STAGE_SECONDS:
+            _record_trace(labels, value)
+
+
+def current_tags():
+    return _tags.get()
+
+
+@contextmanager
+def tags(**labels):
+    """Define rótulos (platform, format, engine) herdados pelos spans dentro do bloco"""
+    token = _tags.set({**_tags.get(), **{k: v for k, v in labels.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def observe_stage(stage, seconds, **labels):
+    labels = {**_tags.get(), **labels, 'stage': stage}
+    STAGE_SECONDS.observe(seconds, **labels)
+    _record_trace(labels, seconds)
+
+
+@contextmanager
+def span(stage, **labels):
+    """Mede a duração de uma etapa (funciona com código síncrono e com await dentro do bloco)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, **labels)
+
+
+def _record_trace(labels, seconds):
+    trace = _trace.get()
+    if trace is not None:
+        trace['spans'].append({**labels, 'ms': round(seconds * 1000, 1)})
+
+
+def start_trace(enabled):
+    """Inicia o trace do request atual (se habilitado) e retorna seu id"""
+    if not (enabled or TRACE_REQUESTS):
+        return None
+    trace = {'id': uuid.uuid4().hex[:12], 'spans': []}
+    _trace.set(trace)
+    return trace['id']
+
+
+def finish_trace(**fields):
+    trace = _trace.get()
+    if trace is None:
+        return
+    _trace.set(None)
+    print('🔎 ' + json.dumps({'trace': trace['id'], **fields, 'spans': trace['spans']}, ensure_ascii=False))
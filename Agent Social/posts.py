@@ -0,0 +1,40 @@
+import re
+
+# Viewport (largura, altura) de cada plataforma
+PLATFORM_VIEWPORTS = {'instagram': (1080, 1080), 'linkedin': (1200, 630), 'twitter': (1200, 675)}
+# HTML sem plataforma declarada (ex: enviado pelo cliente sem o campo platform)
+DEFAULT_VIEWPORT = PLATFORM_VIEWPORTS['instagram']
+
+# Plataforma declarada no <head> de cada template; o conteúdo gerado pelo LLM fica no <body>
+# e não interfere (antes o viewport era adivinhado por "1200px"/"630px" em qualquer lugar do HTML)
+POST_PLATFORM_TAG = '<meta name="agent-social-platform" content="{platform}">'
+_POST_PLATFORM_RE = re.compile(r'<meta name="agent-social-platform" content="([a-z]+)">')
+
+
+def post_platform(html_content):
+    """Plataforma declarada no <head> do post, ou 'unknown'"""
+    match = _POST_PLATFORM_RE.search(html_content.split('<body', 1)[0])
+    if match and match.group(1) in PLATFORM_VIEWPORTS:
+        return match.group(1)
+    return 'unknown'
+
+
+def post_viewport(html_content):
+    """Viewport (largura, altura) da plataforma declarada no post"""
+    return PLATFORM_VIEWPORTS.get(post_platform(html_content), DEFAULT_VIEWPORT)
+
+
+def post_meta(platform):
+    """Metadados explícitos do post, gravados junto com o HTML no storage"""
+    width, height = PLATFORM_VIEWPORTS[platform]
+    return {'platform': platform, 'width': width, 'height': height}
+
+
+def with_platform(html_content, platform):
+    """Declara a plataforma num HTML que ainda não a tem (posts antigos ou HTML do cliente)"""
+    if platform not in PLATFORM_VIEWPORTS or post_platform(html_content) != 'unknown':
+        return html_content
+    tag = POST_PLATFORM_TAG.format(platform=platform)
+    if '<head>' in html_content:
+        return html_content.replace('<head>', '<head>\n' + tag, 1)
+    return tag + html_content
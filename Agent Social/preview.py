@@ -0,0 +1,38 @@
+import math
+import os
+
+from encoding import format_supported
+
+# Escala (device scale factor) do preview renderizado: 0.5 = metade da resolução da exportação
+PREVIEW_SCALE = float(os.getenv('PREVIEW_SCALE', 0.5))
+# Formato do preview; sem suporte no Pillow cai para JPG
+PREVIEW_FORMAT = os.getenv('PREVIEW_FORMAT', 'webp')
+# Preset de encoding do preview (menos CPU que o da exportação)
+PREVIEW_PRESET = os.getenv('PREVIEW_PRESET', 'fast')
+# Prazo do preview em segundos (0.5-30); estourou, o front-end mantém o preview em HTML
+PREVIEW_BUDGET = max(0.5, min(float(os.getenv('PREVIEW_BUDGET', 3)), 30.0))
+# Formato da versão completa renderizada em background depois do preview
+PREVIEW_UPGRADE_FORMAT = os.getenv('PREVIEW_UPGRADE_FORMAT', 'png')
+
+# Formatos rápidos o bastante para o preview
+PREVIEW_FORMATS = ('webp', 'jpg', 'jpeg')
+# Limites da escala do preview
+MIN_PREVIEW_SCALE = 0.1
+MAX_PREVIEW_SCALE = 1.0
+
+
+def resolve_preview(scale=None, format=None):
+    """Normaliza (escala, formato) do preview aplicando os padrões e limites seguros.
+
+    Levanta ValueError para escala que não é um número finito (o endpoint responde 400)."""
+    try:
+        scale = float(scale or PREVIEW_SCALE)
+    except (TypeError, ValueError):
+        raise ValueError(f"Escala inválida: {scale!r}") from None
+    if not math.isfinite(scale):
+        raise ValueError(f"Escala inválida: {scale!r}")
+    scale = max(MIN_PREVIEW_SCALE, min(scale, MAX_PREVIEW_SCALE))
+    format = (format or PREVIEW_FORMAT).lower()
+    if format not in PREVIEW_FORMATS or not format_supported(format):
+        format = 'jpg'
+    return scale, format
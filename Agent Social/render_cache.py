@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+RENDER_CACHE_MEMORY_BYTES = int(os.getenv('RENDER_CACHE_MEMORY_MB', 128)) * 1024 * 1024
+RENDER_CACHE_DISK_BYTES = int(os.getenv('RENDER_CACHE_DISK_MB', 1024)) * 1024 * 1024
+RENDER_CACHE_DIR = os.getenv(
+    'RENDER_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'agent-social-render-cache')
+)
+
+
+def render_key(html_content, format, viewport, settings=None):
+    """Hash do conteúdo + formato + viewport + configurações de encoding"""
+    payload = json.dumps({
+        'format': 'jpg' if format == 'jpeg' else format,
+        'viewport': list(viewport),
+        'settings': settings or {},
+    }, sort_keys=True)
+    digest = hashlib.sha256(payload.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(html_content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Cache endereçado por conteúdo com camada LRU em memória e camada em disco"""
+
+    def __init__(self, memory_bytes=RENDER_CACHE_MEMORY_BYTES, disk_bytes=RENDER_CACHE_DISK_BYTES,
+                 directory=RENDER_CACHE_DIR):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.directory = directory if disk_bytes > 0 else None
+
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = None
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        data = self._disk_get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, data)
+        return data
+
+    def put(self, key, data):
+        with self._lock:
+            self.stores += 1
+            self._memory_put(key, data)
+        self._disk_put(key, data)
+
+    def _memory_put(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.evictions += 1
+
+    def _disk_get(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # mtime funciona como "último acesso" para a evição
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _disk_put(self, key, data):
+        if not self.directory or len(data) > self.disk_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escrita atômica: outros workers nunca leem um arquivo pela metade
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            print(f"⚠️  Falha ao gravar cache em disco: {e}")
+            return
+
+        with self._lock:
+            # Regravar uma chave (misses simultâneos, re-put após sair da memória) troca o
+            # arquivo: só a diferença de tamanho entra na conta
+            try:
+                previous = os.stat(path).st_size
+            except OSError:
+                previous = 0
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"⚠️  Falha ao gravar cache em disco: {e}")
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                return
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += len(data) - previous
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_disk_size(self):
+        return sum(size for _, size, _ in self._disk_entries())
+
+    def _evict_disk(self):
+        """Remove os arquivos menos usados até caber em 90% do orçamento"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._disk_size = total
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory_size,
+            'disk_bytes': self._disk_size,
+        }
@@ -0,0 +1,327 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+
+import metrics
+
+
+def _worker_count(value):
+    if value in (None, '', 'auto'):
+        return os.cpu_count() or 1
+    return int(value)
+
+
+# Processos de renderização (cada um com seus browsers); 0 renderiza no próprio processo web
+RENDER_WORKERS = _worker_count(os.getenv('RENDER_WORKERS', '0'))
+# Segundos sem resposta nem progresso de uma renderização antes de considerar o worker travado
+RENDER_WORKER_TIMEOUT = float(os.getenv('RENDER_WORKER_TIMEOUT', 120))
+# Tentativas extras quando o worker cai no meio de uma renderização
+RENDER_WORKER_RETRIES = int(os.getenv('RENDER_WORKER_RETRIES', 1))
+# Renderizações simultâneas por worker: uma por página do Playwright e por driver do Selenium
+RENDER_WORKER_SLOTS = int(os.getenv('RENDER_POOL_SIZE', 2)) + int(os.getenv('SELENIUM_POOL_SIZE', 2))
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+def _pack(result):
+    """Copia o resultado (bytes ou {nome: bytes}) para um segmento de memória compartilhada"""
+    parts = result if isinstance(result, dict) else {None: result}
+    total = sum(len(data) for data in parts.values())
+    shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+    layout = []
+    offset = 0
+    for name, data in parts.items():
+        shm.buf[offset:offset + len(data)] = data
+        layout.append((name, offset, len(data)))
+        offset += len(data)
+    shm.close()
+    return shm.name, layout
+
+
+def _unpack(shm_name, layout):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        parts = {name: bytes(shm.buf[offset:offset + size]) for name, offset, size in layout}
+    finally:
+        shm.close()
+        shm.unlink()
+    if list(parts) == [None]:
+        return parts[None]
+    return parts
+
+
+def _worker_main(conn, index):
+    """Processo de renderização: só browsers e encoders (sem Flask, LLM, storage, filas ou cache).
+
+    Recebe (id, método, args) e executa as chamadas em paralelo no loop próprio; cada resposta
+    leva o id, e o artefato vai por memória compartilhada."""
+    from assets import AssetBundle
+    from renderer import Renderer
+    from runtime import background_loop, run_async
+
+    renderer = Renderer(AssetBundle())
+    # Métricas deste processo vão junto com cada resposta para o processo web
+    metrics.start_forwarding()
+    selenium_primary = not renderer.playwright_pool
+    if renderer.playwright_pool:
+        try:
+            run_async(renderer.playwright_pool.start())
+        except Exception as e:
+            print(f"⚠️  Worker {index}: Chromium não iniciou ({e}), usando o Selenium")
+            selenium_primary = True
+    # Os drivers do Selenium vivem neste processo, então são pré-iniciados aqui
+    renderer.prestart_selenium(primary=selenium_primary)
+    print(f"🧩 Worker de renderização {index} pronto (pid {os.getpid()})")
+
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    async def handle(call_id, method, args):
+        def progress(done, total):
+            send(('progress', call_id, done, total))
+
+        try:
+            result = await getattr(renderer, method)(*args, on_progress=progress)
+            send(('done', call_id) + _pack(result) + (metrics.drain(),))
+        except Exception as e:
+            send(('error', call_id, str(e), metrics.drain()))
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        call_id, method, args = request
+        background_loop.submit(handle(call_id, method, args))
+
+    run_async(renderer.close())
+
+
+class _Call:
+    def __init__(self, loop, on_progress):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.on_progress = on_progress
+        self.last_seen = time.monotonic()
+
+    def resolve(self, result=None, error=None):
+        def apply():
+            if self.future.done():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+        self.loop.call_soon_threadsafe(apply)
+
+
+class _Worker:
+    def __init__(self, index, context):
+        self.index = index
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, index), name=f'render-worker-{index}', daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.renders = 0
+        self.calls = {}
+        self.dead = False
+        self.reason = None
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, name=f'render-worker-{index}-reader', daemon=True)
+        self._reader.start()
+
+    @property
+    def in_flight(self):
+        return len(self.calls)
+
+    def alive(self):
+        return not self.dead and self.process.is_alive()
+
+    def send(self, call_id, call, method, args):
+        self.calls[call_id] = call
+        try:
+            with self._send_lock:
+                self.conn.send((call_id, method, args))
+        except (OSError, ValueError) as e:
+            self.calls.pop(call_id, None)
+            raise WorkerCrashed(f'worker {self.index} não aceitou o pedido: {e}')
+
+    def _read(self):
+        """Encaminha as respostas do processo para as chamadas em andamento (thread própria)"""
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            call = self.calls.get(message[1])
+            if call is None:
+                continue
+            call.last_seen = time.monotonic()
+            if message[0] == 'progress':
+                if call.on_progress:
+                    call.on_progress(message[2], message[3])
+                continue
+            self.calls.pop(message[1], None)
+            self.renders += 1
+            metrics.replay(message[-1])
+            if message[0] == 'error':
+                call.resolve(error=RuntimeError(message[2]))
+                continue
+            try:
+                call.resolve(_unpack(message[2], message[3]))
+            except Exception as e:
+                call.resolve(error=e)
+        self._fail_all(self.reason or f'worker {self.index} caiu')
+
+    def _fail_all(self, reason):
+        self.dead = True
+        calls, self.calls = self.calls, {}
+        for call in calls.values():
+            call.resolve(error=WorkerCrashed(reason))
+
+    def kill(self, reason=None):
+        self.dead = True
+        self.reason = reason or f'worker {self.index} encerrado'
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        self._fail_all(self.reason)
+
+
+class RenderWorkerPool:
+    """Pool de processos de renderização, com reinício automático.
+
+    Cada worker atende até `slots` chamadas ao mesmo tempo (as páginas e drivers dos seus
+    pools); os pedidos vão para o worker vivo menos ocupado."""
+
+    def __init__(self, workers=RENDER_WORKERS, slots=RENDER_WORKER_SLOTS, timeout=RENDER_WORKER_TIMEOUT,
+                 retries=RENDER_WORKER_RETRIES):
+        self.size = workers
+        self.slots = slots
+        self.timeout = timeout
+        self.retries = retries
+        # spawn: o processo web tem threads (loop, drivers) e fork não é seguro
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._capacity = None
+        self._start_lock = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+        self.busy = 0
+        self.renders = 0
+        self.restarts = 0
+        self.failures = 0
+
+    async def _ensure_started(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._capacity is not None:
+                return
+            self._workers = await asyncio.to_thread(
+                lambda: [_Worker(i, self._context) for i in range(self.size)]
+            )
+            self._capacity = asyncio.Semaphore(self.size * self.slots)
+            print(f"🧩 {self.size} workers de renderização iniciados ({self.slots} renderizações cada)")
+
+    def _restart(self, worker, reason):
+        """Substitui um worker que caiu ou travou por um processo novo (uma vez por worker)"""
+        with self._lock:
+            if self._workers[worker.index] is not worker:
+                return
+            worker.kill(reason)
+            self._workers[worker.index] = _Worker(worker.index, self._context)
+            self.restarts += 1
+        print(f"♻️  Worker de renderização {worker.index} reiniciado ({reason})")
+
+    def _pick(self):
+        workers = [worker for worker in self._workers if not worker.dead] or self._workers
+        return min(workers, key=lambda worker: worker.in_flight)
+
+    async def _call_once(self, method, args, on_progress):
+        worker = self._pick()
+        if worker.dead:
+            await asyncio.to_thread(self._restart, worker, f'worker {worker.index} caiu')
+            worker = self._pick()
+        call = _Call(asyncio.get_running_loop(), on_progress)
+        worker.send(next(self._ids), call, method, args)
+        while True:
+            done, _ = await asyncio.wait({call.future}, timeout=self.timeout)
+            if done:
+                break
+            # Progresso recente (frames de GIF/MP4) mantém a chamada viva
+            if time.monotonic() - call.last_seen >= self.timeout:
+                reason = f'worker {worker.index} sem resposta há {self.timeout:.0f}s'
+                await asyncio.to_thread(self._restart, worker, reason)
+        try:
+            return call.future.result()
+        except WorkerCrashed:
+            if not worker.process.is_alive():
+                await asyncio.to_thread(self._restart, worker, f'worker {worker.index} caiu')
+            raise
+
+    async def call(self, method, *args, on_progress=None):
+        """Executa Renderer.<method>(*args) em um worker e retorna o artefato"""
+        await self._ensure_started()
+
+        attempt = 0
+        async with self._capacity:
+            self.busy += 1
+            try:
+                while True:
+                    try:
+                        result = await self._call_once(method, args, on_progress)
+                        self.renders += 1
+                        return result
+                    except WorkerCrashed as e:
+                        self.failures += 1
+                        if attempt >= self.retries:
+                            raise RuntimeError(f"Worker de renderização falhou: {e}")
+                        print(f"💥 Worker de renderização falhou ({e}), tentando de novo...")
+                        attempt += 1
+            finally:
+                self.busy -= 1
+
+    def stats(self):
+        workers = list(self._workers)
+        alive = sum(1 for worker in workers if worker.alive())
+        started = self._capacity is not None
+        return {
+            'workers': self.size,
+            'slots_per_worker': self.slots,
+            'started': started,
+            'alive': alive,
+            'busy': self.busy,
+            'idle': self.size * self.slots - self.busy if started else 0,
+            'renders': self.renders,
+            'restarts': self.restarts,
+            'failures': self.failures,
+            'healthy': not started or alive == self.size,
+        }
+
+    async def close(self):
+        # Síncrono de propósito: roda no encerramento, quando threads novas já não são aceitas
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=10)
+            worker.kill()
+        self._workers = []
@@ -0,0 +1,283 @@
+"""Renderização no browser (Playwright com fallback Selenium), sem nada do app web.
+
+É o que os processos de renderização importam (ver render_workers): só browsers, encoders
+e métricas, sem Flask, LLM, storage, filas ou cache."""
+import asyncio
+import importlib.util
+import os
+
+from animation import (
+    PAUSE_ANIMATIONS_JS, SEEK_ANIMATIONS_JS,
+    PAUSE_ANIMATIONS_SELENIUM_JS, SEEK_ANIMATIONS_SELENIUM_JS,
+    resolve_capture, frame_times, frame_duration_ms
+)
+from browser_pool import PlaywrightBrowserPool, SeleniumDriverPool, SETTLE_MS, WAIT_FONTS_PLAYWRIGHT_JS
+from encoding import encode_gif, encode_image
+from metrics import RENDERS, span, tags
+from posts import post_platform, post_viewport
+from preview import PREVIEW_PRESET
+from video import FFmpegEncoder, FRAME_JPEG_QUALITY
+
+# Selenium, Playwright e Pillow só são importados no primeiro uso
+PLAYWRIGHT_AVAILABLE = importlib.util.find_spec('playwright') is not None
+
+# Argumentos do Chrome usado pelo Selenium (fallback)
+SELENIUM_ARGUMENTS = (
+    '--headless',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--window-size=1080,1080',
+    '--hide-scrollbars',
+    '--disable-web-security',
+)
+
+# Drivers do Selenium pré-iniciados quando ele é só o fallback (sem Playwright: o pool todo)
+SELENIUM_FALLBACK_PRESTART = int(os.getenv('SELENIUM_FALLBACK_PRESTART', 1))
+
+
+class Renderer:
+    """Browsers e capturas de um processo: métodos _render_* chamados pelo agente ou por um worker"""
+
+    def __init__(self, assets):
+        # Tailwind pré-compilado, fontes e ícones servidos localmente (ver build_assets.py)
+        self.assets = assets
+        
+        # Chromium persistente para o Playwright (lançado no primeiro uso)
+        self.playwright_pool = PlaywrightBrowserPool(asset_bundle=assets) if PLAYWRIGHT_AVAILABLE else None
+        
+        # Drivers reutilizáveis para o Selenium
+        self.selenium_pool = SeleniumDriverPool(SELENIUM_ARGUMENTS)
+    
+    def prestart_selenium(self, primary=not PLAYWRIGHT_AVAILABLE):
+        """Pré-inicia drivers no processo dono do pool, para o fallback não pagar o cold start"""
+        count = self.selenium_pool.size if primary else SELENIUM_FALLBACK_PRESTART
+        if count > 0:
+            self.selenium_pool.prestart_in_background(count)
+    
+    async def close(self):
+        if self.playwright_pool:
+            await self.playwright_pool.close()
+        await asyncio.to_thread(self.selenium_pool.close)
+    
+    def selenium_html_to_image(self, html_content, format='png', frames=None, fps=None, on_progress=None,
+                               preview_scale=None):
+        """Converte HTML para imagem usando Selenium (método confiável)"""
+        is_gif = format.lower() == 'gif'
+        try:
+            # Definir tamanho da janela baseado na plataforma
+            with self.selenium_pool.driver(*post_viewport(html_content)) as driver:
+                # Carregar página e aguardar documento, fontes e animações de entrada
+                # (GIF e preview não precisam esperar: as animações são posicionadas explicitamente)
+                with span('page_load'):
+                    self.selenium_pool.load(
+                        driver, self.assets.inline(html_content), settle=not (is_gif or preview_scale)
+                    )
+                
+                if is_gif:
+                    return self._selenium_gif(driver, frames, fps, on_progress)
+                
+                if preview_scale:
+                    driver.execute_async_script(PAUSE_ANIMATIONS_SELENIUM_JS)
+                    driver.execute_async_script(SEEK_ANIMATIONS_SELENIUM_JS, SETTLE_MS)
+                
+                # Capturar screenshot
+                with span('screenshot'):
+                    screenshot_bytes = driver.get_screenshot_as_png()
+            
+            # Converter para o formato desejado (mesmo encoder do Playwright)
+            if preview_scale:
+                # Sem device scale factor por driver: o preview é reduzido no encode
+                return encode_image(screenshot_bytes, format.lower(), PREVIEW_PRESET, preview_scale)
+            return encode_image(screenshot_bytes, format.lower())
+            
+        except Exception as e:
+            print(f"Erro Selenium: {e}")
+            raise Exception(f"Erro ao gerar imagem com Selenium: {str(e)}")
+    
+    def _selenium_gif(self, driver, frames=None, fps=None, on_progress=None):
+        """Captura frames determinísticos para GIF com o driver já carregado"""
+        frames, fps = resolve_capture(frames, fps)
+        
+        # Congelar animações e avançar o relógio manualmente, sem esperas reais
+        driver.execute_async_script(PAUSE_ANIMATIONS_SELENIUM_JS)
+        screenshots = []
+        for i, t in enumerate(frame_times(frames, fps)):
+            driver.execute_async_script(SEEK_ANIMATIONS_SELENIUM_JS, t)
+            with span('screenshot'):
+                screenshots.append(driver.get_screenshot_as_png())
+            if on_progress:
+                on_progress(i + 1, frames)
+        
+        return self._build_gif(screenshots, frame_duration_ms(fps))
+    
+    def _build_gif(self, screenshots, duration):
+        """Monta o GIF animado a partir dos screenshots PNG"""
+        return encode_gif(screenshots, duration)
+
+    async def _load_page(self, page, html_content, settle=True):
+        """Carrega o HTML na página e aguarda recursos, fontes e animações de entrada"""
+        with span('page_load'):
+            await page.set_content(html_content, wait_until=self.assets.wait_until)
+            await page.evaluate(WAIT_FONTS_PLAYWRIGHT_JS)
+            if settle:
+                await page.wait_for_timeout(SETTLE_MS)
+    
+    async def _playwright_gif(self, page, frames=None, fps=None, on_progress=None):
+        """Captura frames determinísticos para GIF com a página já carregada"""
+        frames, fps = resolve_capture(frames, fps)
+        
+        # Congelar animações e avançar o relógio manualmente, sem esperas reais
+        await page.evaluate(PAUSE_ANIMATIONS_JS)
+        screenshots = []
+        for i, t in enumerate(frame_times(frames, fps)):
+            await page.evaluate(SEEK_ANIMATIONS_JS, t)
+            with span('screenshot'):
+                screenshots.append(await page.screenshot(type='png'))
+            if on_progress:
+                on_progress(i + 1, frames)
+        
+        return await asyncio.to_thread(self._build_gif, screenshots, frame_duration_ms(fps))
+
+    async def _playwright_screenshot(self, page, format, preset=None):
+        """Screenshot estático no formato pedido"""
+        # PNG sem perdas do browser + encoder único, para o resultado não depender do engine
+        with span('screenshot'):
+            screenshot_bytes = await page.screenshot(type='png')
+        return await asyncio.to_thread(encode_image, screenshot_bytes, format.lower(), preset)
+
+    async def _playwright_preview(self, page, format):
+        """Preview reduzido: animações posicionadas no fim da entrada em vez de esperar por ela"""
+        await page.evaluate(PAUSE_ANIMATIONS_JS)
+        await page.evaluate(SEEK_ANIMATIONS_JS, SETTLE_MS)
+        return await self._playwright_screenshot(page, format, PREVIEW_PRESET)
+
+    async def playwright_html_to_image(self, html_content, format='png', frames=None, fps=None, on_progress=None,
+                                       preview_scale=None):
+        """Converte HTML para imagem usando Playwright (se disponível)"""
+        if not PLAYWRIGHT_AVAILABLE:
+            raise Exception("Playwright não está disponível")
+        
+        is_gif = format.lower() == 'gif'
+        try:
+            # Viewport da plataforma declarada no post
+            width, height = post_viewport(html_content)
+            
+            async with self.playwright_pool.page(width, height, preview_scale or 1) as page:
+                # Carregar conteúdo e aguardar recursos
+                await self._load_page(page, html_content, settle=not (is_gif or preview_scale))
+                
+                if preview_scale:
+                    return await self._playwright_preview(page, format)
+                
+                if is_gif:
+                    # Para GIF, capturar frames em instantes exatos das animações
+                    return await self._playwright_gif(page, frames, fps, on_progress)
+                    
+                else:
+                    # Screenshot normal
+                    return await self._playwright_screenshot(page, format)
+                    
+        except Exception as e:
+            print(f"Erro Playwright: {e}")
+            raise Exception(f"Erro ao gerar imagem com Playwright: {str(e)}")
+
+    async def _render_capture(self, html_content, scale, engine='playwright', on_progress=None):
+        """Screenshot PNG sem reencode no device scale factor pedido"""
+        width, height = post_viewport(html_content)
+        with tags(platform=post_platform(html_content), format='capture', engine=engine):
+            if engine == 'playwright':
+                if not PLAYWRIGHT_AVAILABLE:
+                    raise Exception("Playwright não está disponível")
+                async with self.playwright_pool.page(width, height, scale) as page:
+                    await self._load_page(page, html_content)
+                    with span('screenshot'):
+                        capture = await page.screenshot(type='png')
+            else:
+                capture = await asyncio.to_thread(self._selenium_capture, html_content, scale)
+            RENDERS.inc(engine=engine, format='capture')
+            return capture
+
+    def _selenium_capture(self, html_content, scale):
+        with self.selenium_pool.driver(*post_viewport(html_content), scale) as driver:
+            with span('page_load'):
+                self.selenium_pool.load(driver, self.assets.inline(html_content))
+            with span('screenshot'):
+                return driver.get_screenshot_as_png()
+
+    async def _render_formats(self, html_content, formats, frames=None, fps=None, on_progress=None):
+        """Captura os formatos pedidos numa única página do Playwright (qualquer falha é propagada)"""
+        results = {}
+        with tags(platform=post_platform(html_content), engine='playwright'):
+            async with self.playwright_pool.page(*post_viewport(html_content)) as page:
+                await self._load_page(page, html_content)
+                for i, f in enumerate(formats):
+                    with tags(format=f):
+                        if f == 'gif':
+                            results[f] = await self._playwright_gif(page, frames, fps)
+                        else:
+                            results[f] = await self._playwright_screenshot(page, f)
+                    RENDERS.inc(engine='playwright', format=f)
+                    if on_progress:
+                        on_progress(i + 1, len(formats))
+        return results
+
+    async def _render_image(self, html_content, format='png', frames=None, fps=None, engine='playwright',
+                            preview_scale=None, on_progress=None):
+        """Converte HTML para imagem com o engine escolhido pelo roteador (o fallback fica com ele)"""
+        with tags(platform=post_platform(html_content), format=format, engine=engine):
+            if engine == 'playwright':
+                print(f"🎭 Usando Playwright para {format}...")
+                image_bytes = await self.playwright_html_to_image(
+                    html_content, format, frames, fps, on_progress, preview_scale
+                )
+            else:
+                print(f"🌐 Usando Selenium para {format}...")
+                image_bytes = await asyncio.to_thread(
+                    self.selenium_html_to_image, html_content, format, frames, fps, on_progress, preview_scale
+                )
+            RENDERS.inc(engine=engine, format=format)
+            return image_bytes
+
+    async def _playwright_video(self, page, settings, on_progress=None):
+        """Avança as animações frame a frame e envia cada frame direto ao encoder"""
+        width, height = page.viewport_size['width'], page.viewport_size['height']
+        encoder = FFmpegEncoder(
+            width, height,
+            fps=settings['fps'],
+            crf=settings['crf'],
+            bitrate=settings['bitrate'],
+            faststart=settings['faststart']
+        )
+        await encoder.start()
+        
+        try:
+            await page.evaluate(PAUSE_ANIMATIONS_JS)
+            total_frames = int(settings['duration'] * settings['fps'])
+            # Vídeo começa do instante 0 para mostrar as animações de entrada
+            for i, t in enumerate(frame_times(total_frames, settings['fps'], start_ms=0)):
+                await page.evaluate(SEEK_ANIMATIONS_JS, t)
+                with span('screenshot'):
+                    frame = await page.screenshot(type='jpeg', quality=FRAME_JPEG_QUALITY)
+                await encoder.write(frame)
+                if on_progress:
+                    on_progress(i + 1, total_frames)
+            # O ffmpeg codifica em paralelo à captura; aqui só sobra o final do arquivo
+            with span('encode'):
+                return await encoder.finish()
+        except BaseException:
+            await encoder.abort()
+            raise
+
+    async def _render_video(self, html_content, settings, on_progress=None):
+        """Renderiza o MP4 com Playwright + ffmpeg"""
+        # Resolução segue a plataforma do post
+        width, height = post_viewport(html_content)
+        
+        with tags(platform=post_platform(html_content), format='mp4', engine='playwright'):
+            async with self.playwright_pool.page(width, height) as page:
+                # Carregar conteúdo (sem espera: o relógio das animações é controlado)
+                await self._load_page(page, html_content, settle=False)
+                video_bytes = await self._playwright_video(page, settings, on_progress)
+            RENDERS.inc(engine='playwright', format='mp4')
+            return video_bytes
@@ -0,0 +1,115 @@
+import asyncio
+import atexit
+import functools
+import os
+import threading
+
+# Threads que executam as views no entrypoint ASGI (como o --threads do gunicorn)
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 32))
+
+
+class BackgroundLoop:
+    """Event loop único, rodando em thread própria, para recursos assíncronos de longa duração"""
+
+    def __init__(self, name='render-loop'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """Retorna o loop, iniciando a thread na primeira utilização"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    self._start()
+        return self._loop
+
+    def _start(self):
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+        self._loop = loop
+
+    def submit(self, coro):
+        """Agenda a corrotina no loop e retorna um concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Executa a corrotina no loop compartilhado e bloqueia até o resultado"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError('run() chamado de dentro do loop compartilhado; use await')
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+
+background_loop = BackgroundLoop()
+
+
+def run_async(coro, timeout=None):
+    """Atalho para executar corrotinas no loop compartilhado a partir de código síncrono"""
+    return background_loop.run(coro, timeout)
+
+
+def sync_view(func):
+    """Adapta uma view async do Flask para rodar no loop compartilhado.
+
+    O contexto (request, app) é copiado da thread do worker para a task, então a view
+    acessa `request` normalmente e aguarda browsers/LLM sem criar um loop por request."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return background_loop.run(func(*args, **kwargs))
+    return wrapper
+
+
+def on_shutdown(coro_factory):
+    """Registra uma corrotina de encerramento executada no loop compartilhado ao sair"""
+    def _shutdown():
+        if background_loop._loop is None:
+            return
+        try:
+            background_loop.run(coro_factory(), timeout=10)
+        except Exception as e:
+            print(f"⚠️  Erro no encerramento: {e}")
+    atexit.register(_shutdown)
+
+
+def wsgi_to_asgi(wsgi_app, threads=ASGI_THREADS):
+    """Adaptador ASGI que atende cada request WSGI numa thread de um pool dimensionado.
+
+    O WsgiToAsgi do asgiref roda as views com thread_sensitive=True: fora de um contexto
+    síncrono todos os requests caem num executor de uma thread só, e um SSE ou GIF longo
+    bloqueia o processo inteiro (inclusive /livez)."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+    executor = ThreadPoolExecutor(threads, thread_name_prefix='asgi-view')
+    run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+    class Instance(WsgiToAsgiInstance):
+        async def run_wsgi_app(self, body):
+            await sync_to_async(run_wsgi_app, thread_sensitive=False, executor=executor)(self, body)
+
+    class Adapter(WsgiToAsgi):
+        async def __call__(self, scope, receive, send):
+            await Instance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+    return Adapter(wsgi_app)
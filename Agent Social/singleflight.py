@@ -0,0 +1,60 @@
+import asyncio
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Chamadas idênticas simultâneas compartilham uma única execução (o cache só ajuda depois).
+
+    Só deve ser usado no loop compartilhado. A execução continua enquanto houver alguém
+    aguardando; se todos desistirem (ex: clientes desconectaram), ela é cancelada."""
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        """Executa factory() para a chave, ou aguarda a execução que já está em andamento"""
+        flight = self._flights.get(key)
+        # Execução já terminada (o callback de limpeza ainda não rodou) não é reaproveitada
+        if flight is None or flight.task.done():
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: quem desiste não cancela o trabalho dos demais
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+                # Quem chegar agora começa uma execução nova, em vez de receber o cancelamento
+                self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _finish(self, key, flight):
+        self._forget(key, flight)
+        # Evita o aviso de exceção nunca lida quando ninguém mais aguarda
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self):
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,348 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+HTML_STORAGE_BACKEND = os.getenv('HTML_STORAGE_BACKEND', 'memory')
+HTML_STORAGE_TTL = int(os.getenv('HTML_STORAGE_TTL', 3600))
+HTML_STORAGE_MAX_BYTES = int(os.getenv('HTML_STORAGE_MAX_MB', 64)) * 1024 * 1024
+HTML_STORAGE_COMPRESS = os.getenv('HTML_STORAGE_COMPRESS', '1') == '1'
+HTML_STORAGE_PATH = os.getenv(
+    'HTML_STORAGE_PATH',
+    os.path.join(tempfile.gettempdir(), 'agent-social-html.sqlite3')
+)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+# Prefixos que indicam como o valor foi gravado
+_RAW = b'r'
+_ZLIB = b'z'
+# Metadados do post (JSON) antes do HTML: b'm' + json + b'\n' + valor com prefixo próprio
+_META = b'm'
+
+
+class MemoryBackend:
+    """Backend em processo: LRU com TTL e orçamento de bytes"""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=HTML_STORAGE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # key -> (expires_at, value)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _drop(self, key):
+        _, value = self._items.pop(key)
+        self._size -= len(value)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (time.time() + ttl, value)
+            self._size += len(value)
+            self._purge_expired()
+            while self._size > self.max_bytes and len(self._items) > 1:
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def _purge_expired(self):
+        now = time.time()
+        for key in [k for k, (expires_at, _) in self._items.items() if expires_at <= now]:
+            self._drop(key)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+
+    def count(self):
+        with self._lock:
+            self._purge_expired()
+            return len(self._items)
+
+    def size(self):
+        return self._size
+
+    def usage(self):
+        with self._lock:
+            self._purge_expired()
+            return len(self._items), self._size
+
+    def clear(self):
+        with self._lock:
+            count = len(self._items)
+            self._items.clear()
+            self._size = 0
+            return count
+
+
+class SQLiteBackend:
+    """Backend compartilhado entre workers do mesmo host (arquivo SQLite em modo WAL)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=HTML_STORAGE_PATH, max_bytes=HTML_STORAGE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.evictions = 0
+        with self._conn() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS html_storage (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_html_accessed ON html_storage (accessed_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                'SELECT value FROM html_storage WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE html_storage SET accessed_at = ? WHERE key = ?', (now, key))
+            return bytes(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO html_storage (key, value, size, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, sqlite3.Binary(value), len(value), now + ttl, now)
+            )
+            conn.execute('DELETE FROM html_storage WHERE expires_at <= ?', (now,))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM html_storage').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute('SELECT key, size FROM html_storage ORDER BY accessed_at').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM html_storage WHERE key = ?', (key,))
+            total -= size
+            self.evictions += 1
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute('DELETE FROM html_storage WHERE key = ?', (key,))
+
+    def count(self):
+        with self._conn() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM html_storage WHERE expires_at > ?', (time.time(),)
+            ).fetchone()[0]
+
+    def size(self):
+        with self._conn() as conn:
+            return conn.execute('SELECT COALESCE(SUM(size), 0) FROM html_storage').fetchone()[0]
+
+    def usage(self):
+        with self._conn() as conn:
+            return conn.execute(
+                'SELECT COALESCE(SUM(expires_at > ?), 0), COALESCE(SUM(size), 0) FROM html_storage',
+                (time.time(),)
+            ).fetchone()
+
+    def clear(self):
+        with self._conn() as conn:
+            return conn.execute('DELETE FROM html_storage').rowcount
+
+
+# Grava o valor e atualiza o índice (expiração por chave) e o total de bytes numa só operação
+_REDIS_SET = """
+local old = redis.call('HGET', KEYS[3], ARGV[1])
+if old then redis.call('DECRBY', KEYS[4], old) end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], string.len(ARGV[2]))
+redis.call('INCRBY', KEYS[4], string.len(ARGV[2]))
+"""
+
+# Remove do índice as chaves apagadas (ARGV[2]) ou já expiradas e retorna {entradas, bytes}
+_REDIS_PRUNE = """
+local gone = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if ARGV[2] then table.insert(gone, ARGV[2]) end
+for _, member in ipairs(gone) do
+    local size = redis.call('HGET', KEYS[2], member)
+    if size then
+        redis.call('DECRBY', KEYS[3], size)
+        redis.call('HDEL', KEYS[2], member)
+    end
+    redis.call('ZREM', KEYS[1], member)
+end
+return {redis.call('ZCARD', KEYS[1]), tonumber(redis.call('GET', KEYS[3]) or '0')}
+"""
+
+
+class RedisBackend:
+    """Backend Redis (ou compatível). O TTL fica no Redis; o orçamento de bytes deve ser
+    garantido com maxmemory + maxmemory-policy allkeys-lru no servidor.
+
+    Contagem e bytes vêm de um índice mantido a cada gravação (sorted set por expiração e
+    hash de tamanhos), sem varrer o keyspace. Chaves despejadas pelo maxmemory só saem
+    do índice quando o TTL delas vence."""
+
+    name = 'redis'
+
+    def __init__(self, client=None, url=REDIS_URL, prefix='html:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        # Fora do padrão prefix* (não aparecem no scan do clear)
+        base = prefix.rstrip(':')
+        self._index_keys = [f'{base}-index', f'{base}-sizes', f'{base}-bytes']
+        self._set = client.register_script(_REDIS_SET)
+        self._prune = client.register_script(_REDIS_PRUNE)
+        self.evictions = 0
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self._set(keys=[self.prefix + key] + self._index_keys, args=[key, value, ttl, time.time() + ttl])
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+        self._prune(keys=self._index_keys, args=[time.time(), key])
+
+    def _keys(self):
+        return list(self.client.scan_iter(match=self.prefix + '*'))
+
+    def usage(self):
+        """(entradas, bytes) pelo índice, descartando as chaves já expiradas"""
+        entries, size = self._prune(keys=self._index_keys, args=[time.time()])
+        return int(entries), int(size)
+
+    def count(self):
+        return self.usage()[0]
+
+    def size(self):
+        return self.usage()[1]
+
+    def clear(self):
+        # Manutenção: varre o keyspace para levar também valores gravados antes do índice
+        keys = self._keys()
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(*self._index_keys)
+        return len(keys)
+
+
+class HtmlStorage:
+    """Armazenamento de HTML gerado com TTL, compressão opcional e backends plugáveis"""
+
+    def __init__(self, backend, ttl=HTML_STORAGE_TTL, compress=HTML_STORAGE_COMPRESS):
+        self.backend = backend
+        self.ttl = ttl
+        self.compress = compress
+
+    def _encode(self, html_content):
+        raw = html_content.encode('utf-8')
+        if self.compress:
+            return _ZLIB + zlib.compress(raw, 6)
+        return _RAW + raw
+
+    def _decode(self, value):
+        return self._decode_post(value)[0]
+
+    def _decode_post(self, value):
+        """(html, metadados) de um valor gravado; valores sem metadados retornam {}"""
+        meta = {}
+        if value[:1] == _META:
+            header, value = value[1:].split(b'\n', 1)
+            meta = json.loads(header)
+        return self._decode_html(value), meta
+
+    def _decode_html(self, value):
+        if value[:1] == _ZLIB:
+            return zlib.decompress(value[1:]).decode('utf-8')
+        return value[1:].decode('utf-8')
+
+    def set(self, key, html_content, meta=None):
+        """Grava o HTML e, opcionalmente, metadados explícitos do post (plataforma, viewport)"""
+        value = self._encode(html_content)
+        if meta:
+            value = _META + json.dumps(meta, separators=(',', ':')).encode('utf-8') + b'\n' + value
+        self.backend.set(key, value, self.ttl)
+
+    def get(self, key):
+        if not key:
+            return None
+        value = self.backend.get(key)
+        return self._decode(value) if value is not None else None
+
+    def get_post(self, key):
+        """(html, metadados) ou (None, {}) se a chave não existir ou tiver expirado"""
+        if not key:
+            return None, {}
+        value = self.backend.get(key)
+        return self._decode_post(value) if value is not None else (None, {})
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def clear(self):
+        return self.backend.clear()
+
+    def __len__(self):
+        return self.backend.count()
+
+    def stats(self):
+        # Entradas e bytes numa consulta só ao backend
+        entries, size = self.backend.usage()
+        return {
+            'backend': self.backend.name,
+            'entries': entries,
+            'bytes': size,
+            'ttl': self.ttl,
+            'compress': self.compress,
+            'evictions': self.backend.evictions,
+        }
+
+
+def create_storage(backend=HTML_STORAGE_BACKEND):
+    """Cria o storage configurado via HTML_STORAGE_BACKEND (memory, sqlite ou redis)"""
+    if backend == 'sqlite':
+        return HtmlStorage(SQLiteBackend())
+    if backend == 'redis':
+        return HtmlStorage(RedisBackend())
+    if backend != 'memory':
+        print(f"⚠️  Backend de storage desconhecido '{backend}', usando memória")
+    return HtmlStorage(MemoryBackend())
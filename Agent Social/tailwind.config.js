@@ -0,0 +1,50 @@
+// Configuração usada pelo build_assets.py para pré-compilar o Tailwind dos renders.
+// O conteúdo é gerado pela IA em tempo de execução, então as utilidades mais comuns
+// ficam no safelist; as classes dos templates são extraídas do próprio agent.py.
+const colors = '(slate|gray|zinc|neutral|stone|red|orange|amber|yellow|lime|green|emerald|teal|cyan|sky|blue|indigo|violet|purple|fuchsia|pink|rose)';
+const shades = '(50|100|200|300|400|500|600|700|800|900|950)';
+const alphas = '(5|10|15|20|25|30|40|50|60|70|75|80|90|95)';
+const spacing = '(0|px|0\\.5|1|1\\.5|2|2\\.5|3|3\\.5|4|5|6|7|8|9|10|11|12|14|16|20|24|28|32|36|40|44|48|52|56|60|64|72|80|96)';
+const fractions = '(1\\/2|1\\/3|2\\/3|1\\/4|3\\/4|1\\/5|2\\/5|3\\/5|4\\/5|full|screen|auto|fit|min|max)';
+
+module.exports = {
+  content: ['./agent.py'],
+  safelist: [
+    { pattern: new RegExp(`^(bg|text|border|from|via|to|ring|shadow|divide|fill|stroke|decoration)-${colors}-${shades}$`) },
+    { pattern: new RegExp(`^(bg|text|border|from|via|to|ring)-${colors}-${shades}\\/${alphas}$`) },
+    { pattern: new RegExp(`^(bg|text|border|from|via|to|ring|fill|stroke)-(white|black|transparent|current)$`) },
+    { pattern: new RegExp(`^(bg|text|border|from|via|to|ring)-(white|black)\\/${alphas}$`) },
+    { pattern: new RegExp(`^-?(p|px|py|pt|pb|pl|pr|m|mx|my|mt|mb|ml|mr|gap|gap-x|gap-y|space-x|space-y)-${spacing}$`) },
+    { pattern: new RegExp(`^-?(top|bottom|left|right|inset|inset-x|inset-y|translate-x|translate-y)-(${spacing.slice(1, -1)}|${fractions.slice(1, -1)})$`) },
+    { pattern: new RegExp(`^(w|h|min-w|min-h|max-h|size)-(${spacing.slice(1, -1)}|${fractions.slice(1, -1)})$`) },
+    { pattern: /^max-w-(none|xs|sm|md|lg|xl|2xl|3xl|4xl|5xl|6xl|7xl|full|prose|screen-sm|screen-md|screen-lg)$/ },
+    { pattern: /^text-(xs|sm|base|lg|xl|2xl|3xl|4xl|5xl|6xl|7xl|8xl|9xl|left|center|right|justify)$/ },
+    { pattern: /^font-(thin|extralight|light|normal|medium|semibold|bold|extrabold|black|sans|serif|mono)$/ },
+    { pattern: /^(leading|tracking)-(none|tight|tighter|snug|normal|relaxed|loose|wide|wider|widest|3|4|5|6|7|8|9|10)$/ },
+    { pattern: /^(block|inline-block|inline|flex|inline-flex|grid|inline-grid|hidden|contents|table)$/ },
+    { pattern: /^(static|fixed|absolute|relative|sticky|isolate)$/ },
+    { pattern: /^flex-(row|row-reverse|col|col-reverse|wrap|nowrap|1|auto|initial|none)$/ },
+    { pattern: /^(grow|shrink|grow-0|shrink-0)$/ },
+    { pattern: /^(items|justify|content|self|place-items|place-content)-(start|end|center|between|around|evenly|stretch|baseline)$/ },
+    { pattern: /^(grid-cols|grid-rows|col-span|row-span)-(1|2|3|4|5|6|12|full)$/ },
+    { pattern: /^rounded(-(t|b|l|r|tl|tr|bl|br))?(-(none|sm|md|lg|xl|2xl|3xl|full))?$/ },
+    { pattern: /^border(-(t|b|l|r|x|y))?(-(0|2|4|8))?$/ },
+    { pattern: /^border-(solid|dashed|dotted|double|none)$/ },
+    { pattern: /^(shadow|drop-shadow)(-(sm|md|lg|xl|2xl|inner|none))?$/ },
+    { pattern: /^ring(-(0|1|2|4|8))?$/ },
+    { pattern: /^opacity-(0|5|10|20|25|30|40|50|60|70|75|80|90|95|100)$/ },
+    { pattern: /^bg-gradient-to-(t|tr|r|br|b|bl|l|tl)$/ },
+    { pattern: /^bg-(cover|contain|center|no-repeat|clip-text)$/ },
+    { pattern: /^(blur|backdrop-blur)(-(none|sm|md|lg|xl|2xl|3xl))?$/ },
+    { pattern: /^(scale|rotate|-rotate)-(0|1|2|3|6|12|45|50|75|90|95|100|105|110|125|150|180)$/ },
+    { pattern: /^z-(0|10|20|30|40|50|auto)$/ },
+    { pattern: /^overflow(-x|-y)?-(auto|hidden|visible|scroll)$/ },
+    { pattern: /^(object|aspect)-(contain|cover|center|square|video|auto)$/ },
+    { pattern: /^animate-(none|spin|ping|pulse|bounce)$/ },
+    { pattern: /^(uppercase|lowercase|capitalize|italic|not-italic|underline|line-through|no-underline|truncate|antialiased|whitespace-nowrap|break-words)$/ },
+    { pattern: /^line-clamp-(1|2|3|4|5|6)$/ },
+    { pattern: /^(transform|transition|transition-all|duration-300|ease-in-out|mix-blend-overlay|mix-blend-multiply)$/ },
+  ],
+  theme: { extend: {} },
+  plugins: [],
+};
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('asgiref')
+flask = pytest.importorskip('flask')
+
+from runtime import wsgi_to_asgi
+
+
+def make_app():
+    app = flask.Flask(__name__)
+
+    @app.route('/slow')
+    def slow():
+        time.sleep(1)
+        return 'ok'
+
+    return app
+
+
+async def request(application, path):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'root_path': '',
+        'http_version': '1.1', 'headers': [], 'server': ('localhost', 80), 'client': ('127.0.0.1', 1),
+    }
+    await application(scope, receive, send)
+    return messages[0]['status'], b''.join(m.get('body', b'') for m in messages[1:])
+
+
+def test_requests_run_concurrently():
+    application = wsgi_to_asgi(make_app(), threads=4)
+
+    async def main():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request(application, '/slow') for _ in range(3)))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+    assert results == [(200, b'ok')] * 3
+    # Em série levaria 3s (o WsgiToAsgi padrão usa um executor de uma thread)
+    assert elapsed < 2
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from engine_router import ENGINE_BREAKER_THRESHOLD, EngineRouter
+
+
+async def broken(engine, hedge):
+    raise RuntimeError('page crashed')
+
+
+def test_render_with_records_batch_failures():
+    router = EngineRouter(['playwright', 'selenium'])
+
+    for _ in range(ENGINE_BREAKER_THRESHOLD):
+        with pytest.raises(RuntimeError):
+            asyncio.run(router.render_with('playwright', 'batch', broken))
+
+    assert router.engines['playwright'].success_rate() == 0
+    assert not router.healthy('playwright')
+    # Circuito aberto: o lote nem tenta
+    with pytest.raises(Exception, match='circuito aberto'):
+        asyncio.run(router.render_with('playwright', 'batch', broken))
+    assert router.engines['playwright'].skipped == 1
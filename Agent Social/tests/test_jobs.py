@@ -0,0 +1,34 @@
+import time
+
+from jobs import RenderJobQueue
+
+
+def submit_and_wait(queue, size):
+    async def render(report_progress):
+        return b'x' * size, 'image/png', 'post.png'
+
+    job = queue.submit('image', render, 'png')
+    deadline = time.monotonic() + 5
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == 'done'
+    return job
+
+
+def test_result_bytes_are_capped():
+    queue = RenderJobQueue(concurrency={'image': 1}, max_result_bytes=250)
+    first = submit_and_wait(queue, 100)
+    second = submit_and_wait(queue, 100)
+    third = submit_and_wait(queue, 100)
+    assert queue.get(first.id) is None
+    assert queue.get(second.id) is second and queue.get(third.id) is third
+    assert queue.result_bytes == 200
+    assert queue.stats()['evictions'] == 1
+
+
+def test_expired_results_are_purged_on_read():
+    queue = RenderJobQueue(concurrency={'image': 1}, result_ttl=0)
+    job = submit_and_wait(queue, 10)
+    time.sleep(0.01)
+    assert queue.get(job.id) is None
+    assert queue.result_bytes == 0
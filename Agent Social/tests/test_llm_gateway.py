@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+openai = pytest.importorskip('openai')
+
+from llm_gateway import CircuitBreaker, CircuitOpenError, LLMGateway, LLMSetupError
+
+
+class UpstreamError(openai.APIError):
+    """APIError sem request/response (o SDK exige objetos HTTP no construtor)"""
+
+    def __init__(self):
+        Exception.__init__(self, 'bad request')
+
+
+def half_open_gateway():
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.failures = 1
+    breaker.opened_at = time.monotonic() - 31
+    gateway = LLMGateway(api_key='x', base_url='http://127.0.0.1:9', max_retries=0, breaker=breaker)
+    return gateway, breaker
+
+
+def run(gateway, call):
+    return asyncio.run(gateway._attempts(call))
+
+
+async def ok(client):
+    return 'ok'
+
+
+def test_client_side_error_releases_probe():
+    gateway, breaker = half_open_gateway()
+
+    async def invalid(client):
+        raise ValueError('parâmetro inválido')
+
+    with pytest.raises(ValueError):
+        run(gateway, invalid)
+    assert breaker.state == 'half_open'
+    assert run(gateway, ok) == 'ok'
+    assert breaker.state == 'closed'
+
+
+def test_upstream_error_reopens_circuit():
+    gateway, breaker = half_open_gateway()
+
+    async def rejected(client):
+        raise UpstreamError()
+
+    with pytest.raises(UpstreamError):
+        run(gateway, rejected)
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        run(gateway, ok)
+
+
+def test_setup_error_does_not_take_probe():
+    gateway, breaker = half_open_gateway()
+
+    def broken():
+        raise LLMSetupError('sem SDK')
+
+    gateway._ensure_client = broken
+    with pytest.raises(LLMSetupError):
+        run(gateway, ok)
+    assert not breaker._probing
+    assert breaker.allow()
@@ -0,0 +1,10 @@
+from render_cache import RenderCache
+
+
+def test_rewriting_a_key_counts_only_the_difference(tmp_path):
+    cache = RenderCache(memory_bytes=1024, disk_bytes=1024 * 1024, directory=str(tmp_path))
+    cache._disk_put('ab' * 8, b'x' * 100)
+    cache._disk_put('cd' * 8, b'y' * 50)
+    cache._disk_put('ab' * 8, b'x' * 100)
+    cache._disk_put('ab' * 8, b'z' * 30)
+    assert cache._disk_size == cache._scan_disk_size() == 80
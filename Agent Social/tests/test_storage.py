@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from storage import HtmlStorage, MemoryBackend, RedisBackend, SQLiteBackend
+
+
+def test_redis_usage_without_scanning():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    client = fakeredis.FakeRedis()
+    storage = HtmlStorage(RedisBackend(client=client), compress=False)
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError('stats() não deve varrer o keyspace')
+
+    client.scan_iter = no_scan
+    storage.set('a', 'x' * 10)
+    storage.set('b', 'y' * 20)
+    storage.set('a', 'z' * 5)
+    stats = storage.stats()
+    assert (stats['entries'], stats['bytes']) == (2, 6 + 21)
+
+    storage.delete('b')
+    assert storage.stats()['entries'] == 1
+
+    storage.backend._set(
+        keys=['html:old'] + storage.backend._index_keys, args=['old', b'r123', 1, time.time() - 1]
+    )
+    assert storage.stats()['entries'] == 1
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_usage_matches_count_and_size(backend, tmp_path):
+    store = MemoryBackend() if backend == 'memory' else SQLiteBackend(path=str(tmp_path / 'html.sqlite3'))
+    storage = HtmlStorage(store, compress=False)
+    storage.set('a', 'x' * 10)
+    storage.set('b', 'y' * 20)
+    stats = storage.stats()
+    assert stats['entries'] == len(storage) == 2
+    assert stats['bytes'] == store.size()
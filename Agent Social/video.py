@@ -0,0 +1,146 @@
+import asyncio
+import os
+import shutil
+
+FFMPEG_BIN = os.getenv('FFMPEG_BIN', 'ffmpeg')
+
+# Padrões de encoding (sobrescrevíveis por request)
+VIDEO_FPS = int(os.getenv('VIDEO_FPS', 30))
+VIDEO_CRF = int(os.getenv('VIDEO_CRF', 23))
+VIDEO_BITRATE = os.getenv('VIDEO_BITRATE')  # ex: "4M" - quando definido substitui o CRF
+VIDEO_PRESET = os.getenv('VIDEO_PRESET', 'veryfast')
+VIDEO_FASTSTART = os.getenv('VIDEO_FASTSTART', '1') == '1'
+VIDEO_MAX_DURATION = int(os.getenv('VIDEO_MAX_DURATION', 30))
+
+# Qualidade dos frames JPEG enviados ao encoder (mais rápidos de capturar que PNG)
+FRAME_JPEG_QUALITY = int(os.getenv('VIDEO_FRAME_QUALITY', 92))
+
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+def resolve_video_settings(duration=5, fps=None, crf=None, bitrate=None, faststart=None):
+    """Normaliza as configurações de vídeo aplicando padrões e limites"""
+    return {
+        'duration': max(1, min(float(duration or 5), VIDEO_MAX_DURATION)),
+        'fps': max(1, min(int(fps or VIDEO_FPS), 60)),
+        'crf': max(0, min(int(crf if crf is not None else VIDEO_CRF), 51)),
+        'bitrate': bitrate or VIDEO_BITRATE,
+        'faststart': VIDEO_FASTSTART if faststart is None else bool(faststart),
+    }
+
+
+class FFmpegEncoder:
+    """Encoder H.264 alimentado frame a frame pelo stdin, sem arquivos intermediários"""
+
+    def __init__(self, width, height, fps=VIDEO_FPS, crf=VIDEO_CRF, bitrate=None,
+                 faststart=VIDEO_FASTSTART, preset=VIDEO_PRESET):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.crf = crf
+        self.bitrate = bitrate
+        self.preset = preset
+        # faststart precisa de saída "seekable": usamos um memfd (arquivo só em memória)
+        self.faststart = faststart and hasattr(os, 'memfd_create')
+
+        self._process = None
+        self._memfd = None
+        self._stdout_task = None
+        self.frames = 0
+
+    def _command(self, output):
+        cmd = [
+            FFMPEG_BIN, '-hide_banner', '-loglevel', 'error', '-nostats', '-y',
+            '-f', 'image2pipe', '-framerate', str(self.fps), '-c:v', 'mjpeg', '-i', 'pipe:0',
+            # yuv420p exige dimensões pares (ex: Twitter 1200x675)
+            '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2',
+            '-c:v', 'libx264', '-preset', self.preset, '-pix_fmt', 'yuv420p',
+        ]
+        if self.bitrate:
+            cmd += ['-b:v', str(self.bitrate), '-maxrate', str(self.bitrate), '-bufsize', str(self.bitrate)]
+        else:
+            cmd += ['-crf', str(self.crf)]
+
+        if self.faststart:
+            cmd += ['-movflags', '+faststart', '-f', 'mp4', output]
+        else:
+            # Saída em pipe não é seekable: MP4 fragmentado (também toca progressivamente)
+            cmd += ['-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4', 'pipe:1']
+        return cmd
+
+    async def start(self):
+        if not ffmpeg_available():
+            raise RuntimeError(f"ffmpeg não encontrado ({FFMPEG_BIN})")
+
+        pass_fds = ()
+        output = None
+        if self.faststart:
+            self._memfd = os.memfd_create('render-mp4')
+            pass_fds = (self._memfd,)
+            output = f'/dev/fd/{self._memfd}'
+
+        self._process = await asyncio.create_subprocess_exec(
+            *self._command(output),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL if self.faststart else asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=pass_fds
+        )
+        if not self.faststart:
+            # Drenar stdout em paralelo para o ffmpeg nunca bloquear
+            self._stdout_task = asyncio.ensure_future(self._process.stdout.read())
+        return self
+
+    async def write(self, frame_bytes):
+        """Envia um frame JPEG ao encoder"""
+        try:
+            self._process.stdin.write(frame_bytes)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise RuntimeError(f"ffmpeg encerrou inesperadamente: {await self._stderr()}")
+        self.frames += 1
+
+    async def _stderr(self):
+        try:
+            return (await self._process.stderr.read()).decode('utf-8', 'replace').strip()
+        except Exception:
+            return ''
+
+    async def finish(self):
+        """Fecha o stdin, aguarda o encoder e retorna os bytes do MP4"""
+        try:
+            self._process.stdin.close()
+            stderr = await self._stderr()
+            returncode = await self._process.wait()
+            stdout = await self._stdout_task if self._stdout_task else None
+
+            if returncode != 0:
+                raise RuntimeError(f"ffmpeg falhou ({returncode}): {stderr}")
+
+            if self.faststart:
+                os.lseek(self._memfd, 0, os.SEEK_SET)
+                chunks = []
+                while True:
+                    chunk = os.read(self._memfd, 1 << 20)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                return b''.join(chunks)
+            return stdout
+        finally:
+            self._close_memfd()
+
+    async def abort(self):
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        if self._stdout_task:
+            self._stdout_task.cancel()
+        self._close_memfd()
+
+    def _close_memfd(self):
+        if self._memfd is not None:
+            os.close(self._memfd)
+            self._memfd = None
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+
+from runtime import background_loop
+
+# Ao iniciar, lança o engine e renderiza uma página de aquecimento em background
+# (o /readyz só responde 200 depois disso)
+PREWARM = os.getenv('PREWARM', '0') == '1'
+# Espera entre tentativas quando o aquecimento falha
+PREWARM_RETRY_DELAY = float(os.getenv('PREWARM_RETRY_DELAY', 10))
+
+
+class Warmup:
+    """Estado de aquecimento do processo: fica pronto quando algum engine já renderizou com sucesso"""
+
+    def __init__(self, enabled=PREWARM, retry_delay=PREWARM_RETRY_DELAY):
+        self.enabled = enabled
+        self.retry_delay = retry_delay
+        self.state = 'pending' if enabled else 'disabled'
+        self.engine = None
+        self.seconds = None
+        self.attempts = 0
+        self.error = None
+        self._started = time.monotonic()
+        self._future = None
+
+    @property
+    def ready(self):
+        # Sem aquecimento o processo fica pronto de imediato e o primeiro request paga o cold start
+        return self.engine is not None or not self.enabled
+
+    def mark_warm(self, engine):
+        """Chamado após o aquecimento ou após qualquer renderização bem-sucedida"""
+        if self.engine is not None:
+            return
+        self.engine = engine
+        self.state = 'ready'
+        self.error = None
+        self.seconds = time.monotonic() - self._started
+        print(f"🔥 {engine} aquecido em {self.seconds:.2f}s desde o início")
+
+    def start(self, warm):
+        """Agenda warm() no loop compartilhado, repetindo até o primeiro sucesso.
+
+        warm é uma corrotina que renderiza a página de aquecimento e retorna o engine usado."""
+        if not self.enabled or self._future is not None:
+            return
+        self._future = background_loop.submit(self._run(warm))
+
+    async def _run(self, warm):
+        while self.engine is None:
+            self.state = 'warming'
+            self.attempts += 1
+            try:
+                self.mark_warm(await warm())
+            except Exception as e:
+                self.state = 'failed'
+                self.error = str(e)
+                print(f"⚠️  Aquecimento falhou ({e}); nova tentativa em {self.retry_delay:.0f}s")
+                await asyncio.sleep(self.retry_delay)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'state': self.state,
+            'ready': self.ready,
+            'engine': self.engine,
+            'seconds': round(self.seconds, 3) if self.seconds is not None else None,
+            'attempts': self.attempts,
+            'error': self.error,
+        }